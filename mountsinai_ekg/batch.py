@@ -0,0 +1,448 @@
+"""Trim one ECG recording against many holo files in worker processes.
+
+The ECG is parsed once in the parent and written as ``.npy`` columns to a
+scratch folder; each worker memory-maps them, so no task pickles samples
+and every process shares the same pages. Tk is never imported here.
+"""
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .runindex import RunIndex
+from .sync import ECGTrace, EKGSync
+
+_FILE_STATES = ('queued', 'running', 'done', 'failed', 'cancelled', 'skipped', 'unchanged')
+TRIMMED_FORMATS = ('csv', 'json', 'h5')
+
+# per-process state set up by _init_worker
+_worker_sync: Optional[EKGSync] = None
+
+
+def share_trace(trace: ECGTrace, folder: str) -> str:
+    os.makedirs(folder, exist_ok=True)
+    for name in ECGTrace.__slots__:
+        np.save(os.path.join(folder, name + '.npy'), np.ascontiguousarray(getattr(trace, name)))
+    return folder
+
+
+def open_shared_trace(folder: str) -> ECGTrace:
+    return ECGTrace(**{
+        name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in ECGTrace.__slots__
+    })
+
+
+def unique_stems(paths: Sequence[str]) -> Dict[str, str]:
+    """File stems for ``paths``; stems shared by several files get a short hash of the full path."""
+    stems = {p: os.path.splitext(os.path.basename(p))[0] for p in paths}
+    seen: Dict[str, int] = {}
+    for stem in stems.values():
+        seen[stem] = seen.get(stem, 0) + 1
+    for path, stem in stems.items():
+        if seen[stem] > 1:
+            digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+            stems[path] = f'{stem}-{digest}'
+    return stems
+
+
+def run_name(ecg_stem: str, h5_path: str, h5_stem: Optional[str] = None) -> str:
+    return f'trimmed_{ecg_stem}__{h5_stem or os.path.splitext(os.path.basename(h5_path))[0]}'
+
+
+def process_holo(
+    sync: EKGSync,
+    h5_path: str,
+    out_dir: str,
+    ecg_stem: str,
+    manual: Optional[Tuple[float, float]] = None,
+    plot: bool = True,
+    formats: Sequence[str] = ('csv',),
+    legacy_json: bool = False,
+    provenance: Optional[Dict[str, Any]] = None,
+    name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Trim the loaded ECG to one holo file and write its run folder.
+
+    Returns the paths written and where the trim landed. ``manual`` is an
+    absolute (start_s, end_s) window; without it the ECG is trimmed to the
+    holo recording. ``formats`` picks the trimmed ECG files (``csv``, ``json``,
+    and ``h5`` for a self-contained bundle, see :mod:`.bundle`);
+    ``legacy_json`` writes the JSON files in their old indented layout.
+    ``provenance`` goes into the bundle; input hashes missing from it are
+    computed here. ``name`` overrides the run folder name.
+    """
+    sync.load_h5(h5_path)
+    try:
+        if manual is not None:
+            trimmed, info = sync.trim_ecg_by_seconds(manual[0], manual[1], relative_to_ecg_start=False)
+        else:
+            trimmed, info = sync.trim_ecg_to_holo()
+
+        run_dir = os.path.join(out_dir, name or run_name(ecg_stem, h5_path))
+        os.makedirs(run_dir, exist_ok=True)
+        out = {
+            'run_dir': run_dir,
+            'csv': os.path.join(run_dir, 'trimmed_ekg.csv') if 'csv' in formats else None,
+            'json': os.path.join(run_dir, 'trimmed_ekg.json') if 'json' in formats else None,
+            'bundle': None,
+            'trim_info': os.path.join(run_dir, 'trim_info.json'),
+            'arterial': os.path.join(run_dir, 'arterial_flow.json'),
+            'plot': None,
+        }
+        if out['csv']:
+            sync.save_trimmed_csv(trimmed, out['csv'])
+        if out['json']:
+            sync.save_trimmed_json(trimmed, out['json'], legacy=legacy_json)
+        sync.save_trim_info_json(info, out['trim_info'])
+        try:
+            sync.save_arterial_json(out['arterial'], legacy=legacy_json)
+        except Exception:
+            out['arterial'] = None
+        if 'h5' in formats:
+            out['bundle'] = _save_bundle(sync, trimmed, info, run_dir, h5_path, provenance)
+        if plot:
+            out['plot'] = sync.plot_combined(trimmed, show=False, save_dir=run_dir)
+        out['rows'] = len(trimmed)
+        out['trim'] = {
+            'mode': info.get('mode', 'holo'),
+            'start_idx': info['start_idx'],
+            'end_idx': info['end_idx'],
+            'start_ns': int(trimmed.timestamp_ns[0]) if len(trimmed) else None,
+            'end_ns': int(trimmed.timestamp_ns[-1]) if len(trimmed) else None,
+            'start_time_diff_ns': info.get('start_time_diff_ns'),
+            'end_time_diff_ns': info.get('end_time_diff_ns'),
+        }
+        return out
+    finally:
+        sync.close()
+
+
+def _save_bundle(sync: EKGSync, trimmed: ECGTrace, info: Dict[str, Any], run_dir: str, h5_path: str, provenance) -> str:
+    from .bundle import BUNDLE_NAME, save_bundle
+    from .runindex import file_digest
+    from .sync import ECG_LOADER_VERSION
+
+    prov = dict(provenance or {})
+    prov.setdefault('h5_path', os.path.abspath(h5_path))
+    for role in ('ecg', 'h5'):
+        source = prov.get(f'{role}_path')
+        if source and not prov.get(f'{role}_sha1') and os.path.exists(source):
+            prov[f'{role}_sha1'] = file_digest(source)
+        if source and os.path.exists(source):
+            prov[f'{role}_size'] = os.path.getsize(source)
+    prov['ecg_loader'] = ECG_LOADER_VERSION
+    velocity = sync.arterial_velocity
+    t_rel_s, unix_time_s = sync.arterial_time_base()
+    return save_bundle(
+        os.path.join(run_dir, BUNDLE_NAME), trimmed, info,
+        velocity=velocity, t_rel_s=t_rel_s, unix_time_s=unix_time_s, provenance=prov,
+    )
+
+
+def _init_worker(ecg_folder: str) -> None:
+    global _worker_sync
+    import matplotlib
+    matplotlib.use('Agg')
+    _worker_sync = EKGSync()
+    _worker_sync.ecg = open_shared_trace(ecg_folder)
+
+
+def _run_task(
+    h5_path: str, out_dir: str, ecg_stem: str, name: str, manual, plot: bool, formats, legacy_json: bool, provenance,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        out = process_holo(
+            _worker_sync, h5_path, out_dir, ecg_stem, manual, plot,
+            formats=formats, legacy_json=legacy_json, provenance=provenance, name=name,
+        )
+        out['error'] = None
+    except Exception as e:
+        out = {'error': f'{type(e).__name__}: {e}', 'traceback': traceback.format_exc()}
+    out['h5_path'] = h5_path
+    out['seconds'] = time.perf_counter() - started
+    return out
+
+
+def default_workers(n_files: int) -> int:
+    return max(1, min(n_files, (os.cpu_count() or 2) - 1))
+
+
+class BatchRun:
+    """A batch of holo files trimmed on a process pool, driven from a thread.
+
+    Start it with :meth:`start` and poll :attr:`states`/:meth:`status` from
+    the UI. A file that fails is recorded in its result and the rest of the
+    batch carries on. :meth:`cancel` drops files that have not started;
+    files already running are allowed to finish. With ``skip_disjoint``,
+    holo files recorded entirely outside the ECG are skipped rather than
+    trimmed to the nearest edge.
+
+    Finished runs are recorded in a :class:`RunIndex` in ``out_dir``; a
+    pair whose inputs and options are unchanged since then, and whose files
+    are all still there, is reported as ``unchanged`` without being redone
+    (or even loading the ECG, when every pair is unchanged). ``force``
+    redoes every pair.
+
+    A ``holo_pool`` (:class:`.holo.HoloSourcePool`) shared by several
+    batches keeps the holo files open between them, so checking which files
+    overlap each ECG recording opens every file only once.
+    """
+
+    def __init__(
+        self,
+        ecg_path: str,
+        h5_paths: Sequence[str],
+        out_dir: str,
+        manual: Optional[Tuple[float, float]] = None,
+        plot: bool = True,
+        workers: Optional[int] = None,
+        sync: Optional[EKGSync] = None,
+        formats: Sequence[str] = ('csv',),
+        skip_disjoint: bool = False,
+        force: bool = False,
+        legacy_json: bool = False,
+        ecg_stem: Optional[str] = None,
+        holo_pool=None,
+    ):
+        self.ecg_path = ecg_path
+        self.h5_paths = list(h5_paths)
+        self.ecg_stem = ecg_stem or os.path.splitext(os.path.basename(ecg_path))[0]
+        # holo files sharing a name (e.g. from different folders) must not share a run folder
+        self.run_names = {
+            p: run_name(self.ecg_stem, p, stem) for p, stem in unique_stems(self.h5_paths).items()
+        }
+        self.out_dir = out_dir
+        self.manual = manual
+        self.plot = plot
+        self.formats = tuple(formats)
+        self.skip_disjoint = skip_disjoint
+        self.force = force
+        self.legacy_json = legacy_json
+        self.holo_pool = holo_pool
+        self.index: Optional[RunIndex] = None
+        self.study_path: Optional[str] = None
+        self._keys: Dict[str, str] = {}
+        self.workers = workers or default_workers(len(self.h5_paths))
+        self.sync = sync or EKGSync()
+        self.states: Dict[str, str] = {p: 'queued' for p in self.h5_paths}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.phase = 'Waiting'
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def start(self) -> 'BatchRun':
+        self._thread = threading.Thread(target=self.run, name='sync-batch', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(_FILE_STATES, 0)
+        for state in list(self.states.values()):
+            counts[state] += 1
+        return counts
+
+    def status(self) -> str:
+        c = self.counts()
+        total = len(self.h5_paths)
+        finished = c['done'] + c['failed'] + c['skipped'] + c['unchanged']
+        if not self.done and finished == 0 and c['running'] == 0:
+            return self.phase
+        text = f"{finished}/{total} files"
+        if c['running']:
+            # the pool hands a task or two to its call queue early, which already counts as running
+            text += f", {min(c['running'], self.workers)} running"
+        if c['failed']:
+            text += f", {c['failed']} failed"
+        if c['unchanged']:
+            text += f", {c['unchanged']} unchanged"
+        if c['skipped']:
+            text += f", {c['skipped']} skipped"
+        if c['cancelled']:
+            text += f", {c['cancelled']} cancelled"
+        if self.done and self.finished_at is not None:
+            text += f" ({self.finished_at - self.started_at:.1f} s)"
+        if self.index is not None and (self.index.hits or self.index.misses):
+            text += f"; run index: {self.index.hits} reused, {self.index.misses} recomputed"
+        return text
+
+    def failures(self) -> List[Dict[str, Any]]:
+        return [r for r in self.results.values() if r.get('error')]
+
+    def run(self) -> None:
+        self.started_at = time.perf_counter()
+        scratch = None
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            pending = [p for p in self.h5_paths if self._check_exists(p)]
+            self.phase = 'Checking for unchanged runs...'
+            self.index = RunIndex(self.out_dir)
+            options = self.run_options()
+            pending = [p for p in pending if not self._unchanged(p, options)]
+            if not pending or self.cancelled:
+                return
+
+            self.phase = 'Loading ECG recording...'
+            self.sync.load_ecg(self.ecg_path)
+            if self.skip_disjoint and self.manual is None:
+                pending = [p for p in pending if self._overlaps_ecg(p)]
+            if not pending or self.cancelled:
+                return
+
+            self.phase = 'Starting workers...'
+            scratch = share_trace(self.sync.ecg, tempfile.mkdtemp(prefix='ekg_batch_'))
+            # spawn, never fork: this runs on a thread of a Tk/matplotlib process whose locks a fork would copy held
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(pending)),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(scratch,),
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        _run_task, p, self.out_dir, self.ecg_stem, self.run_names[p], self.manual, self.plot,
+                        self.formats, self.legacy_json, self._provenance(p),
+                    ): p
+                    for p in pending
+                }
+                while futures:
+                    if self.cancelled:
+                        for future, path in futures.items():
+                            if future.cancel():
+                                self.states[path] = 'cancelled'
+                    for future, path in list(futures.items()):
+                        if future.done():
+                            del futures[future]
+                            if not future.cancelled():
+                                self._record(path, future)
+                        elif future.running():
+                            self.states[path] = 'running'
+                    time.sleep(0.05)
+        except BaseException as e:
+            self.error = e
+        finally:
+            if scratch is not None:
+                # workers are gone, so nothing maps the files any more
+                shutil.rmtree(scratch, ignore_errors=True)
+            self.sync.close()
+            if 'h5' in self.formats and self.error is None:
+                from .bundle import write_study
+                try:
+                    self.study_path = write_study(self.out_dir)
+                except OSError as e:
+                    print(f"Could not write the study file: {e}")
+            if self.index is not None:
+                try:
+                    self.index.save()
+                except OSError as e:
+                    print(f"Could not save the run index: {e}")
+            self.finished_at = time.perf_counter()
+            self._done.set()
+
+    def _check_exists(self, path: str) -> bool:
+        if os.path.exists(path):
+            return True
+        self.states[path] = 'failed'
+        self.results[path] = {'h5_path': path, 'error': f'FileNotFoundError: {path}'}
+        return False
+
+    def _provenance(self, path: str) -> Dict[str, Any]:
+        # hashes the run index already computed, so workers do not read the inputs again
+        known = self.index.files if self.index is not None else {}
+        prov = {'ecg_path': os.path.abspath(self.ecg_path), 'h5_path': os.path.abspath(path)}
+        for role in ('ecg', 'h5'):
+            sha1 = known.get(prov[f'{role}_path'], {}).get('sha1')
+            if sha1:
+                prov[f'{role}_sha1'] = sha1
+        prov['trim'] = 'manual' if self.manual is not None else 'holo'
+        return prov
+
+    def run_options(self) -> Dict[str, Any]:
+        from .recording import software_version
+        from .sync import ECG_LOADER_VERSION
+
+        return {
+            'trim': ['manual', *self.manual] if self.manual is not None else 'holo',
+            'skip_disjoint': self.skip_disjoint,
+            'formats': sorted(self.formats),
+            'legacy_json': self.legacy_json,
+            'plot': self.plot,
+            'version': software_version(),
+            'ecg_loader': ECG_LOADER_VERSION,
+        }
+
+    def _unchanged(self, path: str, options: Dict[str, Any]) -> bool:
+        try:
+            key = self._keys[path] = self.index.run_key(self.ecg_path, path, options)
+        except OSError:
+            return False
+        if self.force:
+            self.index.misses += 1
+            return False
+        result = self.index.lookup(self.run_names[path], key)
+        if result is None:
+            return False
+        self.states[path] = 'skipped' if result.get('skipped') else 'unchanged'
+        self.results[path] = dict(result, cached=True)
+        return True
+
+    def _overlaps_ecg(self, path: str) -> bool:
+        from .holo import HoloSource
+
+        ts = self.sync.ecg.timestamp_ns
+        try:
+            if self.holo_pool is not None:
+                holo = self.holo_pool.get(path)
+                first_ns, last_ns = int(holo.unix_first * 1_000), int(holo.unix_last * 1_000)
+            else:
+                with HoloSource(path) as holo:
+                    first_ns, last_ns = int(holo.unix_first * 1_000), int(holo.unix_last * 1_000)
+        except Exception:
+            return True  # let the worker report why the file cannot be read
+        if len(ts) and first_ns <= int(ts[-1]) and last_ns >= int(ts[0]):
+            return True
+        self.states[path] = 'skipped'
+        self.results[path] = {'h5_path': path, 'error': None, 'skipped': 'no overlap with the ECG recording'}
+        if path in self._keys:
+            self.index.record(self.run_names[path], self._keys[path], self.results[path])
+        return False
+
+    def _record(self, path: str, future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            # the worker process itself died
+            result = {'h5_path': path, 'error': f'{type(e).__name__}: {e}'}
+        self.results[path] = result
+        self.states[path] = 'failed' if result.get('error') else 'done'
+        if not result.get('error') and path in self._keys:
+            stored = {k: v for k, v in result.items() if k != 'seconds'}
+            self.index.record(self.run_names[path], self._keys[path], stored)
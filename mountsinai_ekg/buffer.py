@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def value_field_names(channel_names: Optional[Sequence[str]], prefix: str = "analog_value") -> List[str]:
+    # the first channel keeps the historical "analog_value" column name
+    names = list(channel_names or ["A0"])
+    return [prefix] + [f"{prefix}_{name}" for name in names[1:]]
+
+
+class SampleBlock:
+    """Columnar view over rows ``[start, start + len)`` of a SampleBuffer.
+
+    ``values`` is 1-D for a single channel and ``(rows, channels)`` otherwise;
+    ``filtered`` has the same shape, or is None when no filter stage ran.
+    """
+
+    __slots__ = ("start", "sample_num", "values", "timestamp_ns", "channel_names", "filtered")
+
+    def __init__(
+        self,
+        start: int,
+        sample_num: np.ndarray,
+        values: np.ndarray,
+        timestamp_ns: np.ndarray,
+        channel_names: Optional[Sequence[str]] = None,
+        filtered: Optional[np.ndarray] = None,
+    ):
+        self.start = start
+        self.sample_num = sample_num
+        self.values = values
+        self.timestamp_ns = timestamp_ns
+        self.channel_names = list(channel_names or ["A0"])
+        self.filtered = filtered
+
+    def __len__(self) -> int:
+        return len(self.timestamp_ns)
+
+    @property
+    def stop(self) -> int:
+        return self.start + len(self.timestamp_ns)
+
+    @property
+    def timestamp_seconds(self) -> np.ndarray:
+        return self.timestamp_ns / 1_000_000_000
+
+    @property
+    def n_channels(self) -> int:
+        return 1 if self.values.ndim == 1 else self.values.shape[1]
+
+    def channel(self, index: int = 0) -> np.ndarray:
+        if self.values.ndim == 1:
+            if index != 0:
+                raise IndexError(index)
+            return self.values
+        return self.values[:, index]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        rows = []
+        fields = value_field_names(self.channel_names)
+        # float32 values are widened as they are; write_csv owns the shortest-repr text output
+        columns = [self.channel(i).astype(np.float64).tolist() for i in range(self.n_channels)]
+        if self.filtered is not None:
+            fields += value_field_names(self.channel_names, prefix="filtered_value")
+            filtered = self.filtered.reshape(len(self), -1)
+            columns += [filtered[:, i].astype(np.float64).tolist() for i in range(self.n_channels)]
+        for i, (num, ts_ns) in enumerate(zip(self.sample_num.tolist(), self.timestamp_ns.tolist())):
+            row = {"sample_num": num}
+            for field, column in zip(fields, columns):
+                row[field] = column[i]
+            row["timestamp_ns"] = ts_ns
+            row["timestamp_seconds"] = ts_ns / 1_000_000_000
+            rows.append(row)
+        return rows
+
+
+class SampleBuffer:
+    """Growable columnar sample store backed by fixed-size NumPy chunks.
+
+    A single producer (the pyfirmata callback) appends rows without taking a
+    lock; readers take cheap views of any committed row range. With ``retain``
+    set, whole chunks older than the newest ``retain`` rows are released, so
+    memory stays bounded while row indices keep counting from the first sample.
+    Multi-channel buffers store one row per sampling tick across all channels.
+    With ``filtered=True`` a parallel float32 column holds the output of the
+    scan's filter stage.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 16384,
+        retain: Optional[int] = None,
+        channel_names: Optional[Sequence[str]] = None,
+        filtered: bool = False,
+    ):
+        self.chunk_size = max(1, int(chunk_size))
+        self.filtered = bool(filtered)
+        self.retain = None if retain is None else max(1, int(retain))
+        self.channel_names = list(channel_names or ["A0"])
+        self._lock = threading.Lock()
+        self._chunks: List[tuple] = []
+        self._dropped_chunks = 0
+        self._length = 0
+        self._pos = self.chunk_size
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def n_channels(self) -> int:
+        return len(self.channel_names)
+
+    @property
+    def first_index(self) -> int:
+        return self._dropped_chunks * self.chunk_size
+
+    def _new_chunk(self) -> None:
+        n = self.chunk_size
+        value_shape = (n,) if self.n_channels == 1 else (n, self.n_channels)
+        chunk = (
+            np.empty(n, dtype=np.int64),
+            np.empty(value_shape, dtype=np.float32),
+            np.empty(n, dtype=np.int64),
+        )
+        if self.filtered:
+            chunk += (np.zeros(value_shape, dtype=np.float32),)
+        with self._lock:
+            self._chunks.append(chunk)
+            if self.retain is not None:
+                keep = -(-self.retain // n) + 1
+                excess = len(self._chunks) - keep
+                if excess > 0:
+                    del self._chunks[:excess]
+                    self._dropped_chunks += excess
+        self._pos = 0
+
+    def append(self, sample_num: int, value, timestamp_ns: int) -> None:
+        if self._pos == self.chunk_size:
+            self._new_chunk()
+        nums, values, stamps = self._chunks[-1][:3]
+        pos = self._pos
+        nums[pos] = sample_num
+        values[pos] = value
+        stamps[pos] = timestamp_ns
+        self._pos = pos + 1
+        # publish the row only after every column has been written
+        self._length += 1
+
+    def _write_column(self, column: int, start: int, data: np.ndarray) -> None:
+        n = self.chunk_size
+        stop = min(start + len(data), self._length)
+        with self._lock:
+            dropped = self._dropped_chunks
+            pos = max(start, dropped * n)
+            while pos < stop:
+                chunk_no = pos // n
+                lo = pos - chunk_no * n
+                hi = min(stop - chunk_no * n, n)
+                self._chunks[chunk_no - dropped][column][lo:hi] = data[pos - start:pos - start + hi - lo]
+                pos += hi - lo
+
+    def set_timestamps(self, start: int, timestamp_ns: np.ndarray) -> None:
+        # used by the scan loop to stamp rows in batches from the clock model
+        self._write_column(2, start, timestamp_ns)
+
+    def set_filtered(self, start: int, filtered: np.ndarray) -> None:
+        self._write_column(3, start, filtered)
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> SampleBlock:
+        length = self._length
+        if stop is None or stop > length:
+            stop = length
+        n = self.chunk_size
+        with self._lock:
+            dropped = self._dropped_chunks
+            start = max(dropped * n, min(int(start), stop))
+            if stop > start:
+                chunks = self._chunks[start // n - dropped:(stop - 1) // n + 1 - dropped]
+            else:
+                chunks = []
+        first = start // n
+        parts = []
+        for i, chunk in enumerate(chunks):
+            base = (first + i) * n
+            lo = max(start - base, 0)
+            hi = min(stop - base, n)
+            parts.append(tuple(col[lo:hi] for col in chunk))
+        if len(parts) == 1:
+            columns = parts[0]
+        elif parts:
+            columns = tuple(np.concatenate(cols) for cols in zip(*parts))
+        else:
+            value_shape = (0,) if self.n_channels == 1 else (0, self.n_channels)
+            columns = (
+                np.empty(0, dtype=np.int64),
+                np.empty(value_shape, dtype=np.float32),
+                np.empty(0, dtype=np.int64),
+            )
+            if self.filtered:
+                columns += (np.empty(value_shape, dtype=np.float32),)
+        filtered = columns[3] if self.filtered else None
+        return SampleBlock(start, columns[0], columns[1], columns[2], self.channel_names, filtered)
+
+    def tail(self, count: int) -> SampleBlock:
+        length = self._length
+        return self.view(max(0, length - int(count)), length)
+
+    def snapshot(self) -> SampleBlock:
+        return self.view(0, self._length)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        # compatibility accessor for callers expecting the old list-of-dicts return
+        return self.snapshot().to_dicts()
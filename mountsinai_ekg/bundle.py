@@ -0,0 +1,144 @@
+"""One self-describing HDF5 file per sync run, and a study file linking them.
+
+A bundle holds everything a run otherwise spreads over CSV, JSON and PNG
+files::
+
+    /ecg/{sample_num, analog_value, timestamp_ns, timestamp_seconds}
+    /arterial/{velocity, t_rel_s[, unix_time_s]}
+    /trim          attributes: the trim info, nested keys joined with "."
+    /provenance    attributes: source paths, sizes, SHA-1 hashes, versions
+
+The study file has an external link per run under ``/runs`` and a small
+``/index`` table, so a whole study opens as one file without copying data.
+"""
+from __future__ import annotations
+
+import datetime
+import glob
+import os
+from typing import Any, Dict, Optional
+
+import h5py
+import numpy as np
+
+from .recording import software_version
+
+BUNDLE_NAME = 'sync_run.h5'
+STUDY_NAME = 'study.h5'
+BUNDLE_FORMAT = 'mountsinai_ekg.sync_run'
+STUDY_FORMAT = 'mountsinai_ekg.sync_study'
+
+
+def _flatten(obj, prefix: str = '') -> Dict[str, Any]:
+    if hasattr(obj, '__dict__'):
+        obj = obj.__dict__
+    if isinstance(obj, dict):
+        out = {}
+        for key, value in obj.items():
+            out.update(_flatten(value, f'{prefix}{key}.'))
+        return out
+    if obj is None:
+        return {}  # HDF5 has no null attribute; a missing key means None
+    return {prefix[:-1]: obj}
+
+
+def _column(group, name, values, chunk_rows, filters):
+    values = np.asarray(values)
+    chunks = (max(1, min(chunk_rows, len(values))),) + values.shape[1:] if len(values) else None
+    return group.create_dataset(name, data=values, chunks=chunks, **(filters if chunks else {}))
+
+
+def save_bundle(
+    path: str,
+    trimmed,
+    trim_info: Dict[str, Any],
+    velocity: Optional[np.ndarray] = None,
+    t_rel_s: Optional[np.ndarray] = None,
+    unix_time_s: Optional[np.ndarray] = None,
+    provenance: Optional[Dict[str, Any]] = None,
+    compression: Optional[str] = 'gzip',
+    chunk_rows: int = 65536,
+) -> str:
+    """Write one run's trimmed ECG (an ``ECGTrace``), velocity and metadata to ``path``."""
+    filters = {'compression': compression, 'shuffle': True} if compression else {}
+    tmp_path = path + '.part'
+    try:
+        with h5py.File(tmp_path, 'w', libver='latest') as h5f:
+            ecg = h5f.create_group('ecg')
+            for name in ('sample_num', 'analog_value', 'timestamp_ns', 'timestamp_seconds'):
+                _column(ecg, name, getattr(trimmed, name), chunk_rows, filters)
+            ecg.attrs['rows'] = len(trimmed)
+            ecg.attrs['units'] = 'analog_value: a.u.; timestamp_ns: ns; timestamp_seconds: s'
+
+            arterial = h5f.create_group('arterial')
+            if velocity is not None and len(velocity):
+                _column(arterial, 'velocity', np.asarray(velocity, dtype=np.float64), chunk_rows, filters)
+                _column(arterial, 't_rel_s', t_rel_s, chunk_rows, filters)
+                if unix_time_s is not None:
+                    _column(arterial, 'unix_time_s', unix_time_s, chunk_rows, filters)
+            arterial.attrs['count'] = 0 if velocity is None else len(velocity)
+            arterial.attrs['has_absolute_unix_time'] = unix_time_s is not None
+            arterial.attrs['units'] = 'velocity: a.u.; time: s'
+
+            trim = h5f.create_group('trim')
+            for key, value in _flatten(trim_info).items():
+                trim.attrs[key] = value
+
+            prov = h5f.create_group('provenance')
+            for key, value in _flatten(provenance or {}).items():
+                prov.attrs[key] = value
+            prov.attrs['software_version'] = software_version()
+
+            h5f.attrs['format'] = BUNDLE_FORMAT
+            h5f.attrs['created_at'] = datetime.datetime.now().astimezone().isoformat()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def write_study(out_dir: str, path: Optional[str] = None) -> Optional[str]:
+    """Link every bundle under ``out_dir`` into one study file; returns its path, or None if there are none.
+
+    Links are relative, so the output folder can be moved or shared as a whole.
+    """
+    path = path or os.path.join(out_dir, STUDY_NAME)
+    bundles = sorted(glob.glob(os.path.join(out_dir, '*', BUNDLE_NAME)))
+    if not bundles:
+        return None
+    rows = []
+    for bundle in bundles:
+        try:
+            with h5py.File(bundle, 'r') as h5f:
+                prov, trim = h5f['provenance'].attrs, h5f['trim'].attrs
+                rows.append((
+                    os.path.basename(os.path.dirname(bundle)),
+                    os.path.relpath(bundle, os.path.dirname(os.path.abspath(path))),
+                    str(prov.get('ecg_path', '')),
+                    str(prov.get('h5_path', '')),
+                    int(h5f['ecg'].attrs['rows']),
+                    int(trim.get('start_sample.timestamp_ns', -1)),
+                    int(trim.get('end_sample.timestamp_ns', -1)),
+                ))
+        except (OSError, KeyError) as e:
+            print(f"Skipping unreadable bundle {bundle}: {e}")
+
+    tmp_path = path + '.part'
+    with h5py.File(tmp_path, 'w', libver='latest') as h5f:
+        runs = h5f.create_group('runs')
+        for name, link, *_ in rows:
+            runs[name] = h5py.ExternalLink(link.replace(os.sep, '/'), '/')
+        index = h5f.create_group('index')
+        columns = list(zip(*rows)) if rows else [()] * 7
+        for name, values in zip(('name', 'bundle', 'ecg_path', 'h5_path'), columns[:4]):
+            index.create_dataset(name, data=list(values), dtype=h5py.string_dtype())
+        for name, values in zip(('rows', 'start_ns', 'end_ns'), columns[4:]):
+            index.create_dataset(name, data=np.asarray(values, dtype=np.int64))
+        h5f.attrs['format'] = STUDY_FORMAT
+        h5f.attrs['runs'] = len(rows)
+        h5f.attrs['software_version'] = software_version()
+        h5f.attrs['created_at'] = datetime.datetime.now().astimezone().isoformat()
+    os.replace(tmp_path, path)
+    return path
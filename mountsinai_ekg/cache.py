@@ -0,0 +1,169 @@
+"""On-disk cache of parsed ECG recordings.
+
+Each entry is a directory of ``.npy`` columns plus ``meta.json``, named by a
+hash of the source file's absolute path, size, mtime and the loader version.
+Editing or replacing the CSV, or changing the parser, therefore misses the
+cache instead of returning stale samples. Hits are memory-mapped, so a
+multi-hour recording reloads in milliseconds and pages in only what is used.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_META = 'meta.json'
+
+
+def default_cache_dir() -> str:
+    env = os.environ.get('MOUNTSINAI_EKG_CACHE')
+    if env:
+        return env
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'mountsinai_ekg', 'ecg')
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+class ParsedECGCache:
+    """Size-capped cache of parsed ECG columns.
+
+    ``max_bytes`` caps the whole cache directory; when a new entry pushes it
+    over, the least recently used entries are removed first.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 4 * 1024 ** 3):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, path: str, version: Any, **options: Any) -> str:
+        st = os.stat(path)
+        ident = [os.path.abspath(path), st.st_size, st.st_mtime_ns, version, sorted(options.items())]
+        return hashlib.sha1(json.dumps(ident, default=str).encode()).hexdigest()
+
+    def load(self, path: str, version: Any, **options: Any) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+        """Return ``(columns, meta)`` for ``path`` if cached, memory-mapped read-only."""
+        entry = os.path.join(self.cache_dir, self.key(path, version, **options))
+        try:
+            with open(os.path.join(entry, _META)) as f:
+                meta = json.load(f)
+            columns = {
+                name: np.load(os.path.join(entry, name + '.npy'), mmap_mode='r')
+                for name in meta['columns']
+            }
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(os.path.join(entry, _META))  # marks the entry as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return columns, meta
+
+    def store(self, path: str, version: Any, columns: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None, **options: Any) -> Optional[str]:
+        """Write an entry for ``path``; returns its directory, or None if it could not be written."""
+        key = self.key(path, version, **options)
+        entry = os.path.join(self.cache_dir, key)
+        tmp = os.path.join(self.cache_dir, f'.{key}.{uuid.uuid4().hex}.tmp')
+        try:
+            os.makedirs(tmp)
+            for name, values in columns.items():
+                np.save(os.path.join(tmp, name + '.npy'), np.ascontiguousarray(values))
+            info = dict(meta or {})
+            info.update(
+                source=os.path.abspath(path), version=version, options=options, columns=list(columns), stored_at=time.time()
+            )
+            with open(os.path.join(tmp, _META), 'w') as f:
+                json.dump(info, f, default=str)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        except OSError as e:
+            print(f"Could not cache parsed ECG for {path}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+        self._drop_stale(info['source'], options, keep=key)
+        self.evict(keep=key)
+        return entry
+
+    def _drop_stale(self, source: str, options: Dict[str, Any], keep: str) -> None:
+        # older parses of the same file with the same options can never hit again once it has changed
+        for key, _, _ in self.entries():
+            if key == keep:
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, key, _META)) as f:
+                    other = json.load(f)
+                stale = other.get('source') == source and other.get('options') == options
+            except (OSError, ValueError):
+                continue
+            if stale:
+                shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def entries(self):
+        """``(key, size in bytes, last used)`` for every complete entry."""
+        out = []
+        if not os.path.isdir(self.cache_dir):
+            return out
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            meta = os.path.join(entry, _META)
+            if name.startswith('.') or not os.path.isfile(meta):
+                continue
+            out.append((name, _dir_size(entry), os.path.getmtime(meta)))
+        return out
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                shutil.rmtree(os.path.join(self.cache_dir, key))
+            except OSError:
+                # still memory-mapped somewhere (Windows); try again next time
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for key, _, _ in self.entries():
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self.entries()
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
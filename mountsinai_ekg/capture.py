@@ -0,0 +1,153 @@
+"""Headless ECG capture for lab automation: ``mountsinai-ekg-capture``.
+
+Nothing on this path imports Tk or matplotlib. Samples stream straight to an
+HDF5 recording while only a short window stays in memory.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+from .buffer import SampleBuffer
+from .recorder import StreamRecorder
+from .scanner import EcgScanSession, connect_to_arduino
+
+
+def _parse_pins(text):
+    pins = [p.strip() for p in text.split(",") if p.strip()] or ["0"]
+    return [int(p) for p in pins]
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Capture ECG from an Arduino without the GUI.")
+    p.add_argument("--port", default="AUTO", help="Serial port of the Arduino, or AUTO (default)")
+    p.add_argument("--hz", type=int, default=1000, help="Sampling rate in Hz (default 1000)")
+    p.add_argument("--pins", default="0", help='Analog pins to capture, e.g. "0" or "0,1,2" (default 0)')
+    p.add_argument("--duration", type=float, default=0.0,
+                   help="Stop after this many seconds; 0 runs until Ctrl+C/SIGTERM or --stop-file (default 0)")
+    p.add_argument("--stop-file", help="Stop as soon as this file exists")
+    p.add_argument("-o", "--output", help="HDF5 recording to write (default ecg_capture_<timestamp>.h5)")
+    p.add_argument("--csv", action="store_true", help="Also export the recording as CSV when the capture ends")
+    p.add_argument("--stats-interval", type=float, default=5.0,
+                   help="Seconds between status lines; 0 disables them (default 5)")
+    p.add_argument("--filter", choices=["off", "50", "60"], default="off",
+                   help="Store a filtered column with the given mains notch (default off)")
+    p.add_argument("--beats", action="store_true", help="Detect R peaks and record them with the samples")
+    p.add_argument("--memory-s", type=float, default=10.0,
+                   help="Seconds of samples kept in memory; everything goes to disk (default 10)")
+    return p
+
+
+def run_capture(args) -> int:
+    pins = _parse_pins(args.pins)
+    channel_names = [f"A{p}" for p in pins]
+    output = args.output or f"ecg_capture_{time.strftime('%Y%m%d_%H%M%S')}.h5"
+    output = os.path.abspath(os.path.expanduser(output))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    board = connect_to_arduino(None if args.port.strip().lower() == "auto" else args.port)
+    if board is None:
+        return 1
+
+    filters = None
+    if args.filter != "off":
+        from .dsp import FilterPipeline
+        filters = FilterPipeline(args.hz, notch_hz=float(args.filter))
+    qrs = None
+    if args.beats:
+        from .qrs import QRSDetector
+        qrs = QRSDetector(args.hz)
+
+    recorder = StreamRecorder(
+        output,
+        metadata={
+            "target_hz": args.hz,
+            "port": args.port,
+            "analog_pin": ",".join(f"a:{p}:i" for p in pins),
+            "source": "mountsinai-ekg-capture",
+        },
+    )
+    buffer = SampleBuffer(
+        retain=max(1, int(args.memory_s * args.hz)),
+        channel_names=channel_names,
+        filtered=filters is not None,
+    )
+    session = EcgScanSession(
+        board,
+        target_hz=args.hz,
+        analog_pins=[f"a:{p}:i" for p in pins],
+        buffer=buffer,
+        recorder=recorder,
+        filters=filters,
+        qrs=qrs,
+    )
+
+    stop_reason = []
+
+    def request_stop(reason):
+        if not stop_reason:
+            stop_reason.append(reason)
+        session.stop()
+
+    def on_signal(signum, frame):
+        request_stop(signal.Signals(signum).name)
+
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_signal)
+    if hasattr(signal, "SIGBREAK"):
+        signal.signal(signal.SIGBREAK, on_signal)
+
+    print(f"Capturing {', '.join(channel_names)} at {args.hz} Hz to {output}")
+    started = time.monotonic()
+    next_stats = started + args.stats_interval if args.stats_interval > 0 else None
+    session.start()
+    try:
+        while not session.join(timeout=0.2):
+            now = time.monotonic()
+            if args.duration > 0 and now - started >= args.duration:
+                request_stop("duration")
+            if args.stop_file and os.path.exists(args.stop_file):
+                request_stop("stop file")
+            if next_stats is not None and now >= next_stats:
+                next_stats = now + args.stats_interval
+                line = f"[{now - started:7.1f} s] {session.scan_stats.summary()}"
+                if qrs is not None and qrs.bpm is not None:
+                    line += f" | HR {qrs.bpm:.0f} bpm"
+                print(line, flush=True)
+    finally:
+        request_stop("exit")
+        session.join()
+        try:
+            board.exit()
+        except Exception as e:
+            print(f"Error closing the board: {e}")
+
+    stats = session.stats
+    print(f"Capture stopped ({stop_reason[0]}). {stats['samples']} samples in {stats['elapsed_s']:.1f} s")
+    stats_path = os.path.splitext(output)[0] + ".stats.json"
+    session.scan_stats.dump_json(stats_path, extra={
+        "port": args.port,
+        "channels": channel_names,
+        "stream_path": output,
+        "stop_reason": stop_reason[0],
+    })
+    print(f"Saved scan stats to {stats_path}")
+
+    if args.csv:
+        from .export import write_csv
+        from .recorder import read_recording
+        csv_path = os.path.splitext(output)[0] + ".csv"
+        rows = write_csv(read_recording(output), csv_path)
+        print(f"Exported {rows} rows to {csv_path}")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(run_capture(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class SampleClock:
+    """Reconstruct sample timestamps from the sample counter.
+
+    Instead of stamping every callback with ``time.time_ns()`` (which folds
+    serial buffering and GIL jitter into the timebase), the scan loop feeds one
+    ``(row count, wall time)`` observation per poll. An exponentially weighted
+    linear regression of wall time against row index tracks the board's real
+    sampling interval, including slow clock drift, and rows are stamped in
+    batches from the fitted line. Until enough observations exist the
+    configured sampling interval is used.
+
+    Consecutive batches continue from the previous batch's last stamp at the
+    fitted interval, and the offset to the fitted line is slewed in gradually,
+    so refits never show up as steps in the timestamps. An observation more
+    than ``step_threshold_ns`` off the fit is not jitter but lost rows (a
+    serial dropout): the line is re-anchored on it, the next batch is stamped
+    from the moved line so the gap stays in the timebase, and the step is
+    appended to :attr:`steps` as ``(first row after the step, step in ns)``.
+
+    Because an observation is taken when the scan loop polls, the fitted line
+    sits a roughly constant serial/poll latency after the true sample instant;
+    the slope, and therefore relative timing, is unaffected.
+    """
+
+    def __init__(
+        self,
+        nominal_interval_ns: float,
+        forgetting: float = 0.9995,
+        min_observations: int = 20,
+        slew: float = 0.1,
+        step_threshold_ns: Optional[float] = None,
+    ):
+        self.nominal_interval_ns = float(nominal_interval_ns)
+        self.forgetting = float(forgetting)
+        self.slew = float(slew)
+        self.min_observations = int(min_observations)
+        if step_threshold_ns is None:
+            step_threshold_ns = max(50_000_000.0, 10 * self.nominal_interval_ns)
+        self.step_threshold_ns = float(step_threshold_ns)
+        self.steps: List[Tuple[int, int]] = []
+        self._step_pending = False
+        self.observations = 0
+        self._t0: Optional[int] = None
+        self._w = 0.0
+        self._mean_x = 0.0
+        self._mean_y = 0.0
+        self._cxx = 0.0
+        self._cxy = 0.0
+        self._cyy = 0.0
+        self._last_index: Optional[int] = None
+        # (t0, mean_x, mean_y, slope), replaced as a whole so predict() never sees a half-updated fit
+        self._line: Optional[Tuple[int, float, float, float]] = None
+        self._last_stamp: Optional[int] = None
+
+    def observe(self, count: int, t_ns: int) -> None:
+        if count <= 0:
+            return
+        if self._t0 is None:
+            self._t0 = int(t_ns)
+        # row count-1 is the newest row, and it had arrived by t_ns
+        x = float(count - 1)
+        y = float(t_ns - self._t0)
+        if self.fitted:
+            residual = y - (self._mean_y + (x - self._mean_x) * self.interval_ns)
+            if abs(residual) > self.step_threshold_ns:
+                # moving the mean moves every past observation with it; the slope is unchanged
+                self._mean_y += residual
+                self._step_pending = True
+        lam = self.forgetting
+        self._w = lam * self._w + 1.0
+        dx = x - self._mean_x
+        dy = y - self._mean_y
+        self._mean_x += dx / self._w
+        self._mean_y += dy / self._w
+        self._cxx = lam * self._cxx + dx * (x - self._mean_x)
+        self._cxy = lam * self._cxy + dx * (y - self._mean_y)
+        self._cyy = lam * self._cyy + dy * (y - self._mean_y)
+        self.observations += 1
+        self._line = (self._t0, self._mean_x, self._mean_y, self.interval_ns)
+
+    @property
+    def fitted(self) -> bool:
+        return self.observations >= self.min_observations and self._cxx > 0.0
+
+    @property
+    def interval_ns(self) -> float:
+        if self.fitted:
+            return self._cxy / self._cxx
+        return self.nominal_interval_ns
+
+    @property
+    def drift_ppm(self) -> float:
+        return (self.interval_ns / self.nominal_interval_ns - 1.0) * 1e6
+
+    @property
+    def jitter_ns(self) -> float:
+        # residual standard deviation of the observations around the fitted line
+        if not self.fitted or self._w <= 0.0:
+            return 0.0
+        resid = self._cyy - self._cxy * self._cxy / self._cxx
+        return math.sqrt(max(resid, 0.0) / self._w)
+
+    def predict(self, index: int) -> int:
+        # called from the sample callback thread while observe() runs on the scan loop
+        line = self._line
+        if line is None:
+            return 0
+        t0, mean_x, mean_y, slope = line
+        return t0 + int(round(mean_y + (index - mean_x) * slope))
+
+    def timestamps(self, start: int, stop: int) -> np.ndarray:
+        if stop <= start or self._t0 is None:
+            return np.zeros(max(0, stop - start), dtype=np.int64)
+        slope = self.interval_ns
+        x = np.arange(start, stop, dtype=np.float64)
+        line = self._mean_y + (x - self._mean_x) * slope
+        if self._step_pending and self._last_index is not None and start == self._last_index + 1:
+            # stamp straight from the re-anchored line so the dropout stays visible
+            self.steps.append((start, int(round(line[0] - (self._last_stamp - self._t0) - slope))))
+            rel = line
+        elif self._last_index is not None and start == self._last_index + 1:
+            steps = x - self._last_index
+            last = float(self._last_stamp - self._t0)
+            error = line[-1] - (last + steps[-1] * slope)
+            rel = last + steps * slope + self.slew * error * steps / steps[-1]
+        else:
+            rel = line
+        stamps = self._t0 + np.rint(rel).astype(np.int64)
+        # keep stamps monotonic even if a refit moved the line backwards
+        if self._last_stamp is not None:
+            np.maximum(stamps, self._last_stamp + 1, out=stamps)
+        np.maximum.accumulate(stamps, out=stamps)
+        self._step_pending = False
+        self._last_index = stop - 1
+        self._last_stamp = int(stamps[-1])
+        return stamps
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .buffer import SampleBlock, value_field_names
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _csv_columns(block: SampleBlock):
+    # same columns and order as the old DictWriter output (sorted union of the row keys)
+    columns = {"sample_num": (block.sample_num, None)}
+    values = block.values.reshape(len(block), -1)
+    for i, field in enumerate(value_field_names(block.channel_names)):
+        columns[field] = (values, i)
+    if block.filtered is not None:
+        filtered = block.filtered.reshape(len(block), -1)
+        for i, field in enumerate(value_field_names(block.channel_names, prefix="filtered_value")):
+            columns[field] = (filtered, i)
+    columns["timestamp_ns"] = (block.timestamp_ns, None)
+    columns["timestamp_seconds"] = (block.timestamp_ns, "seconds")
+    names = sorted(columns)
+    return names, [columns[n] for n in names]
+
+
+def _format_column(data: np.ndarray, which, start: int, stop: int) -> np.ndarray:
+    if which == "seconds":
+        # split off whole seconds so the result matches Python's exact int / int division
+        ns = data[start:stop]
+        seconds = (ns // 1_000_000_000).astype(np.float64) + (ns % 1_000_000_000) / 1e9
+        return seconds.astype(str)
+    if which is None:
+        return data[start:stop].astype(str)
+    # float32 values: numpy prints the shortest repr, so 0.2326 stays 0.2326
+    return data[start:stop, which].astype(str)
+
+
+def write_csv(
+    block: SampleBlock,
+    path: str,
+    chunk_rows: int = 65536,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> int:
+    """Write ``block`` as CSV, formatting whole columns per chunk.
+
+    The output is what ``csv.DictWriter`` produced from the old per-sample
+    dicts, without building a dict per row. Raises :class:`ExportCancelled` when ``cancel``
+    is set; the partial file is left for the caller to discard.
+    """
+    names, columns = _csv_columns(block)
+    total = len(block)
+    with open(path, "w", newline="") as f:
+        f.write(",".join(names) + "\r\n")
+        for start in range(0, total, chunk_rows):
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled(path)
+            stop = min(total, start + chunk_rows)
+            text = [_format_column(data, which, start, stop).tolist() for data, which in columns]
+            f.write("".join(",".join(row) + "\r\n" for row in zip(*text)))
+            if progress is not None:
+                progress(stop, total)
+    return total
+
+
+_JSON_NONFINITE = {"nan": "NaN", "inf": "Infinity", "-inf": "-Infinity"}
+
+
+def _json_number_text(values: np.ndarray):
+    # float.__repr__ is what json.dumps writes, and beats numpy's str() by 2x; only this chunk becomes Python objects
+    if values.dtype.kind == "f":
+        values = values.astype(np.float64, copy=False)
+        text = map(float.__repr__, values.tolist())
+        if not np.isfinite(values).all():
+            text = (_JSON_NONFINITE.get(t, t) for t in text)
+        return text
+    return map(str, values.astype(np.int64, copy=False).tolist())
+
+
+def write_json_columns(
+    path: str,
+    meta: dict,
+    columns: Dict[str, Optional[np.ndarray]],
+    chunk_rows: int = 65536,
+    separators: Tuple[str, str] = (",", ":"),
+) -> int:
+    """Write ``{"meta": meta, name: [values...], ...}`` one chunk of each array at a time.
+
+    Numbers come out exactly as ``json.dump`` writes the equivalent Python
+    lists, but only one chunk of a column is ever held as Python objects; a
+    ``None`` column is written as ``null``. The file appears under ``path``
+    only once complete.
+    """
+    item_sep, key_sep = separators
+    tmp_path = path + ".part"
+    rows = 0
+    try:
+        with open(tmp_path, "w") as f:
+            f.write("{" + json.dumps("meta") + key_sep + json.dumps(meta, separators=separators, default=str))
+            for name, values in columns.items():
+                f.write(item_sep + json.dumps(name) + key_sep)
+                if values is None:
+                    f.write("null")
+                    continue
+                values = np.asarray(values)
+                rows = max(rows, len(values))
+                f.write("[")
+                for start in range(0, len(values), chunk_rows):
+                    if start:
+                        f.write(item_sep)
+                    f.write(item_sep.join(_json_number_text(values[start:start + chunk_rows])))
+                f.write("]")
+            f.write("}")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
+
+
+class ExportJob:
+    """One export running on the :class:`ExportService` thread.
+
+    ``source`` is a :class:`SampleBlock` or a callable returning one, so slow
+    reads (e.g. a streamed HDF5 file) also happen off the UI thread. Paths
+    ending in ``.h5``/``.hdf5`` get a binary recording with ``metadata``
+    embedded, anything else CSV. The file is written under a temporary name
+    and renamed when complete. ``after`` runs on the worker with the final
+    path once the file is in place.
+    """
+
+    def __init__(
+        self,
+        source: Union[SampleBlock, Callable[[], SampleBlock]],
+        path: str,
+        after: Optional[Callable[[str], None]] = None,
+        label: Optional[str] = None,
+        metadata: Optional[dict] = None,
+    ):
+        self.source = source
+        self.path = path
+        self.metadata = metadata
+        self.after = after
+        self.label = label or os.path.basename(path)
+        self.rows_written = 0
+        self.rows_total = 0
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        if self._done.is_set() and self.error is None and not self.cancelled:
+            return 1.0
+        return self.rows_written / self.rows_total if self.rows_total else 0.0
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.done and self.error is None and not self.cancelled
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> str:
+        if not self.done:
+            return f"Saving {self.label}: {self.progress * 100:.0f}%"
+        if self.cancelled:
+            return f"Save cancelled: {self.label}"
+        if self.error is not None:
+            return f"Save failed: {self.label} ({self.error})"
+        return f"Saved {self.label} ({self.rows_written} rows, {self.finished_at - self.started_at:.1f} s)"
+
+    def _progress(self, written: int, total: int) -> None:
+        self.rows_written = written
+        self.rows_total = total
+
+    def run(self) -> None:
+        self.started_at = time.time()
+        tmp_path = self.path + ".part"
+        try:
+            if self.cancelled:
+                return
+            block = self.source() if callable(self.source) else self.source
+            self.rows_total = len(block)
+            if os.path.splitext(self.path)[1].lower() in (".h5", ".hdf5"):
+                from .recording import save_recording
+                save_recording(block, tmp_path, metadata=self.metadata, progress=self._progress, cancel=self._cancel)
+            else:
+                write_csv(block, tmp_path, progress=self._progress, cancel=self._cancel)
+            os.replace(tmp_path, self.path)
+            if self.after is not None:
+                self.after(self.path)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError as e:
+                    print(f"Could not remove partial export {tmp_path}: {e}")
+            self.finished_at = time.time()
+            self._done.set()
+
+
+class ExportService:
+    """Background writer that runs export jobs one after another."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[ExportJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.jobs: List[ExportJob] = []
+
+    def submit(self, job: ExportJob) -> ExportJob:
+        with self._lock:
+            self.jobs.append(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ecg-export", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def active(self) -> List[ExportJob]:
+        with self._lock:
+            self.jobs = [job for job in self.jobs if not job.done]
+            return list(self.jobs)
+
+    def cancel_all(self) -> None:
+        for job in self.active():
+            job.cancel()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.run()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._queue.put(None)
+        if wait and self._thread is not None:
+            self._thread.join()
@@ -4,11 +4,22 @@ import threading
 import time
 import csv
 import os
+from collections import deque
 
-from .scanner import connect_to_arduino, start_ecg_scan, stop_ecg_scan
+from .buffer import SampleBuffer
+from .export import ExportJob, ExportService
+from .history import HistoryWindow
+from .liveplot import AutoRange, DisplayScaler, LivePlot, RingBuffer
+from .pyramid import MinMaxPyramid
+from .scanner import EcgScanSession, connect_to_arduino
+
+# matplotlib, scipy (filters, beat detection) and h5py (recordings) are imported on first use,
+# so the window shows before any of them has loaded
 
 
 class MountSinaiEKGApp(tk.Tk):
+    DISPLAY_SCALES = {"Auto": "auto", "0-1": "unit", "0-5 V": "volts", "10-bit ADC": "adc10", "12-bit ADC": "adc12"}
+
     def __init__(self):
         super().__init__()
         self.title("Mount Sinai EKG")
@@ -17,14 +28,31 @@ class MountSinaiEKGApp(tk.Tk):
 
 
         self.arduino_board = None
-        self.analog_input = None
-        self.ecg_data = []
+        self.analog_inputs = []
+        self.channel_names = ["A0"]
+        self.ecg_buffer = SampleBuffer()
+        self.stream_path = None
+        # min/max overview of the whole session, extended by the scan loop
+        self.history_pyramid = None
+        # blocks handed over by the scan thread; deque append/popleft need no lock
+        self._batch_queue = deque()
+        # most recent samples for the live plot, sized to the plot window
+        self._live_raw = RingBuffer(5000)
+        self._live_filtered = None
+        self._live_hz = 1000.0
+        self.display_scaler = DisplayScaler()
+        self.y_autorange = AutoRange()
+        self._autorange_due = 0.0
         self._scan_start_time = None
         self._runtime_updating = False
         self._live_plot_updating = False
         self.scan_thread = None
+        self.scan_session = None
         self._scan_session_id = 0  
         self.autosave_on_stop = True
+        # CSV exports run on a background thread; the UI only polls their progress
+        self.exporter = ExportService()
+        self._export_jobs = []
 
         top_frame = tk.Frame(self, bg="#2e2e2e")
         top_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=10)
@@ -50,6 +78,12 @@ class MountSinaiEKGApp(tk.Tk):
         com_label.pack(side=tk.TOP, anchor="w", pady=(6, 0))
         com_entry = tk.Entry(connect_frame, textvariable=self.com_port_var, width=10)
         com_entry.pack(side=tk.TOP, anchor="w")
+        # Analog pins to capture, e.g. "0" or "0,1,2" for several leads
+        self.pins_var = tk.StringVar(value="0")
+        pins_label = tk.Label(connect_frame, text="Analog pins:", bg="#2e2e2e", fg="white")
+        pins_label.pack(side=tk.TOP, anchor="w", pady=(6, 0))
+        pins_entry = tk.Entry(connect_frame, textvariable=self.pins_var, width=10)
+        pins_entry.pack(side=tk.TOP, anchor="w")
         self.arduino_status = tk.Label(
             connect_frame,
             text="Arduino: Not connected",
@@ -63,6 +97,21 @@ class MountSinaiEKGApp(tk.Tk):
         self.runtime_var = tk.StringVar(value="Runtime: 0.0 s")
         self.runtime_label = tk.Label(self, textvariable=self.runtime_var, bg="#2e2e2e", fg="white")
         self.runtime_label.pack(side=tk.TOP, anchor="w", padx=10)
+        # acquisition health: effective rate, gaps, callback latency, buffer fill
+        self.stats_var = tk.StringVar(value="")
+        self.stats_label = tk.Label(self, textvariable=self.stats_var, bg="#2e2e2e", fg="#aaaaaa")
+        self.stats_label.pack(side=tk.TOP, anchor="w", padx=10)
+        self.hr_var = tk.StringVar(value="")
+        self.hr_label = tk.Label(self, textvariable=self.hr_var, bg="#2e2e2e", fg="lightgreen", font=("TkDefaultFont", 12, "bold"))
+        self.hr_label.pack(side=tk.TOP, anchor="w", padx=10)
+        export_frame = tk.Frame(self, bg="#2e2e2e")
+        export_frame.pack(side=tk.TOP, anchor="w", padx=10)
+        self.export_var = tk.StringVar(value="")
+        tk.Label(export_frame, textvariable=self.export_var, bg="#2e2e2e", fg="#aaaaaa").pack(side=tk.LEFT)
+        self.cancel_export_btn = tk.Button(
+            export_frame, text="Cancel save", command=self.exporter.cancel_all,
+            bg="#444444", fg="white", activebackground="#666666", activeforeground="white",
+        )
 
         self.hz_var = tk.StringVar(value="1000")
         self.hz_label = tk.Label(top_frame, text="Hz:", bg="#2e2e2e", fg="white")
@@ -70,6 +119,23 @@ class MountSinaiEKGApp(tk.Tk):
         self.hz_entry = tk.Entry(top_frame, textvariable=self.hz_var, width=6)
         self.hz_entry.pack(side=tk.LEFT, padx=(0, 10))
 
+        # live plot window length and refresh rate
+        self.window_var = tk.StringVar(value="5")
+        tk.Label(top_frame, text="Window (s):", bg="#2e2e2e", fg="white").pack(side=tk.LEFT, padx=(0, 0))
+        tk.Entry(top_frame, textvariable=self.window_var, width=4).pack(side=tk.LEFT, padx=(0, 4))
+        self.fps_var = tk.StringVar(value="30")
+        tk.Label(top_frame, text="FPS:", bg="#2e2e2e", fg="white").pack(side=tk.LEFT, padx=(0, 0))
+        tk.Entry(top_frame, textvariable=self.fps_var, width=4).pack(side=tk.LEFT, padx=(0, 10))
+        # input range for display scaling; Auto detects it once at the start of each scan
+        self.scale_var = tk.StringVar(value="Auto")
+        tk.Label(top_frame, text="Scale:", bg="#2e2e2e", fg="white").pack(side=tk.LEFT, padx=(0, 0))
+        scale_menu = tk.OptionMenu(top_frame, self.scale_var, *self.DISPLAY_SCALES)
+        scale_menu.config(bg="#444444", fg="white", activebackground="#666666", highlightthickness=0)
+        scale_menu.pack(side=tk.LEFT, padx=(0, 4))
+        self.autorange_var = tk.BooleanVar(value=False)
+        autorange_check = tk.Checkbutton(top_frame, text="Auto Y", variable=self.autorange_var, command=self._reset_y_range, bg="#2e2e2e", fg="white", selectcolor="#444444", activebackground="#444444")
+        autorange_check.pack(side=tk.LEFT, padx=(0, 10))
+
         self.start_btn = tk.Button(top_frame, text="Start Scan", command=self.start_scan, **btn_style)
         self.start_btn.pack(side=tk.LEFT, padx=(0, 10))
 
@@ -80,6 +146,10 @@ class MountSinaiEKGApp(tk.Tk):
         self.save_btn = tk.Button(top_frame, text="Save CSV", command=self.save_csv, **btn_style)
         self.save_btn.pack(side=tk.LEFT, padx=(0, 10))
 
+        self.history_btn = tk.Button(top_frame, text="History", command=self.open_history, **btn_style)
+        self.history_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.history_btn.config(state=tk.DISABLED)
+
         self.filename_var = tk.StringVar(value="output.csv")
         self.filename_label = tk.Label(top_frame, text="Filename:", bg="#2e2e2e", fg="white")
         self.filename_label.pack(side=tk.LEFT, padx=(20, 0))
@@ -97,8 +167,40 @@ class MountSinaiEKGApp(tk.Tk):
         # Autosave enable checkbox
         self.autosave_enabled_var = tk.BooleanVar(value=self.autosave_on_stop)
         autosave_check = tk.Checkbutton(top_frame, text="Autosave", variable=self.autosave_enabled_var, bg="#2e2e2e", fg="white", selectcolor="#444444", activebackground="#444444")
-        autosave_check.pack(side=tk.LEFT, padx=(0, 10))
-
+        autosave_check.pack(side=tk.LEFT, padx=(0, 4))
+        # HDF5 autosaves are a fraction of the CSV size and reload without parsing
+        self.autosave_format_var = tk.StringVar(value="CSV")
+        autosave_format_menu = tk.OptionMenu(top_frame, self.autosave_format_var, "CSV", "HDF5")
+        autosave_format_menu.config(bg="#444444", fg="white", activebackground="#666666", highlightthickness=0)
+        autosave_format_menu.pack(side=tk.LEFT, padx=(0, 10))
+        # Stream-to-disk checkbox: record to HDF5 while scanning and keep only a recent window in RAM
+        self.stream_enabled_var = tk.BooleanVar(value=False)
+        stream_check = tk.Checkbutton(top_frame, text="Stream to disk", variable=self.stream_enabled_var, bg="#2e2e2e", fg="white", selectcolor="#444444", activebackground="#444444")
+        stream_check.pack(side=tk.LEFT, padx=(0, 10))
+        # Real-time filtering (bandpass + baseline removal + mains notch); raw values are always kept
+        self.filter_var = tk.StringVar(value="Off")
+        filter_label = tk.Label(top_frame, text="Filter:", bg="#2e2e2e", fg="white")
+        filter_label.pack(side=tk.LEFT, padx=(0, 0))
+        filter_menu = tk.OptionMenu(top_frame, self.filter_var, "Off", "50 Hz", "60 Hz")
+        filter_menu.config(bg="#444444", fg="white", activebackground="#666666", highlightthickness=0)
+        filter_menu.pack(side=tk.LEFT, padx=(0, 4))
+        self.show_raw_var = tk.BooleanVar(value=False)
+        show_raw_check = tk.Checkbutton(top_frame, text="Show raw", variable=self.show_raw_var, bg="#2e2e2e", fg="white", selectcolor="#444444", activebackground="#444444")
+        show_raw_check.pack(side=tk.LEFT, padx=(0, 10))
+        # Real-time R-peak detection and heart rate
+        self.detect_beats_var = tk.BooleanVar(value=True)
+        beats_check = tk.Checkbutton(top_frame, text="Detect beats", variable=self.detect_beats_var, bg="#2e2e2e", fg="white", selectcolor="#444444", activebackground="#444444")
+        beats_check.pack(side=tk.LEFT, padx=(0, 10))
+
+        # the plot is built once the window is on screen; loading matplotlib takes a while
+        self.live_plot = None
+        self._plot_placeholder = tk.Label(self, text="Loading plot...", bg="#2e2e2e", fg="#aaaaaa")
+        self._plot_placeholder.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.after(10, self._build_plot)
+
+    def _build_plot(self):
+        if self.live_plot is not None:
+            return
         import matplotlib
         matplotlib.use("TkAgg") 
         from matplotlib.figure import Figure
@@ -113,61 +215,114 @@ class MountSinaiEKGApp(tk.Tk):
         self.ax.tick_params(axis="x", colors="white")
         self.ax.tick_params(axis="y", colors="white")
         self.ax.set_ylim(0, 1)
-        self.ax.set_yticks([i / 5 for i in range(6)])
         (self.line,) = self.ax.plot([], [], color="cyan", linewidth=1)
-        self.ax.set_xlim(0, 5)
+        self.lines = [self.line]
+        self.ax.set_xlim(-5, 0)
         self.fig.tight_layout()
 
+        self._plot_placeholder.destroy()
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
         self.canvas.get_tk_widget().pack(side=tk.BOTTOM, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.live_plot = LivePlot(self.canvas, self.ax, self.lines, window_s=5.0)
         self.canvas.draw()
 
-    def _extract_display_value(self, row):
-        v = None
-        for k in ("value", "analog_value", "volts"):
-            if k in row:
-                try:
-                    v = float(row[k])
-                    break
-                except Exception:
-                    pass
-        if v is None:
-            return 0.0
-
-        if v < 0.0:
-            return 0.0
-        if v <= 1.5:            
-            return v
-        if v <= 6.0:             
-            return min(1.0, v / 5.0)
-        if v <= 2048:              
-            return min(1.0, v / 1023.0)
-        return 1.0             
+    def _has_data(self):
+        return len(self.ecg_buffer) > 0
+
+    def _recording_source(self):
+        # bind the current recording now so a new scan can start while it is being saved
+        stream_path = self.stream_path
+        buffer = self.ecg_buffer
+
+        def load():
+            # the in-memory buffer only holds a recent window while streaming, so read the full file back
+            if stream_path and os.path.exists(stream_path):
+                from .recorder import read_recording
+                return read_recording(stream_path)
+            return buffer.snapshot()
+
+        return load
+
+    def open_history(self):
+        pyramid = self.history_pyramid
+        if pyramid is None or pyramid.rows == 0:
+            messagebox.showerror("No Data", "No ECG data to show. Please run a scan first.")
+            return
+        on_close = None
+        if self.stream_path and os.path.exists(self.stream_path):
+            # only a recent window is in memory; zoomed-in views read raw rows from the file
+            import h5py
+            h5f = h5py.File(self.stream_path, "r", libver="latest", swmr=True)
+            dataset = h5f["analog_value"]
+            pyramid.raw = lambda start, stop: dataset[start:stop]
+            on_close = h5f.close
+        else:
+            buffer = self.ecg_buffer
+            pyramid.raw = lambda start, stop: buffer.view(max(start, buffer.first_index), min(stop, len(buffer))).values
+        HistoryWindow(
+            self,
+            pyramid,
+            self._live_hz,
+            channel_names=self.channel_names,
+            title=f"ECG history ({pyramid.rows / self._live_hz:.1f} s)",
+            on_close=on_close,
+        )
+
+    def _submit_export(self, job, notify=False):
+        self.exporter.submit(job)
+        self._export_jobs.append((job, notify))
+        if len(self._export_jobs) == 1:
+            self._watch_exports()
+        return job
+
+    def _watch_exports(self):
+        running = [(job, notify) for job, notify in self._export_jobs if not job.done]
+        for job, notify in self._export_jobs:
+            if not job.done:
+                continue
+            print(job.status())
+            if notify and job.succeeded:
+                messagebox.showinfo("Success", f"ECG data saved to {job.path}")
+            elif notify and job.error is not None:
+                messagebox.showerror("Error", f"Failed to save CSV: {job.error}")
+        self._export_jobs = running
+        if running:
+            self.export_var.set(" | ".join(job.status() for job, _ in running))
+            self.cancel_export_btn.pack(side=tk.LEFT, padx=(10, 0))
+            self.after(200, self._watch_exports)
+        else:
+            self.export_var.set("")
+            self.cancel_export_btn.pack_forget()
+
     def save_csv(self):
-        if not self.ecg_data:
+        if not self._has_data():
             messagebox.showerror("No Data", "No ECG data to save. Please run a scan first.")
             return
 
         initialfile = self.filename_var.get() or "output.csv"
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            filetypes=[("CSV files", "*.csv"), ("HDF5 recording", "*.h5 *.hdf5"), ("All files", "*.*")],
             initialfile=initialfile,
-            title="Save ECG Data as CSV",
+            title="Save ECG Data",
         )
         if not file_path:
             return
 
-        try:
-            fieldnames = sorted(set().union(*(d.keys() for d in self.ecg_data)))
-            with open(file_path, "w", newline="") as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in self.ecg_data:
-                    writer.writerow(row)
-            messagebox.showinfo("Success", f"ECG data saved to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save CSV: {e}")
+        self._submit_export(
+            ExportJob(self._recording_source(), file_path, metadata=self._recording_metadata()),
+            notify=True,
+        )
+
+    def _recording_metadata(self):
+        session = self.scan_session
+        if session is None:
+            return {"port": self.com_port_var.get()}
+        return {
+            "target_hz": session.target_hz,
+            "port": self.com_port_var.get(),
+            "analog_pin": ",".join(session.analog_pins),
+        }
 
 
     def connect_arduino(self):
@@ -178,13 +333,15 @@ class MountSinaiEKGApp(tk.Tk):
         if board:
             self.arduino_board = board
             try:
-                self.analog_input = self.arduino_board.get_pin("a:0:i")
+                pins = [p.strip() for p in self.pins_var.get().split(",") if p.strip()] or ["0"]
+                self.analog_inputs = [self.arduino_board.get_pin(f"a:{int(p)}:i") for p in pins]
+                self.channel_names = [f"A{int(p)}" for p in pins]
                 self.arduino_status.config(text="Arduino: Connected", fg="lightgreen")
             except Exception as e:
                 print(f"Error creating analog pin: {e}")
                 self.arduino_status.config(text="Error creating analog pin!", fg="red")
                 self.arduino_board = None
-                self.analog_input = None
+                self.analog_inputs = []
         else:
             self.arduino_status.config(text="Arduino: Not connected", fg="red")
 
@@ -205,7 +362,8 @@ class MountSinaiEKGApp(tk.Tk):
 
         if self.scan_thread is not None and self.scan_thread.is_alive():
             try:
-                stop_ecg_scan()
+                if self.scan_session is not None:
+                    self.scan_session.stop()
                 self.scan_thread.join(timeout=5)
             except Exception as e:
                 print(f"Error stopping previous scan thread: {e}")
@@ -215,44 +373,80 @@ class MountSinaiEKGApp(tk.Tk):
         current_session = self._scan_session_id
 
         self._live_plot_updating = False
-        self.line.set_data([], [])
-        self.ax.set_xlim(0, 5)
-        self.canvas.draw_idle()
+        self._build_plot()
+        self._ensure_lines(len(self.channel_names))
+        self.live_plot.set_lines(self.lines)
+        window_s = self._float_setting(self.window_var, 5.0)
+        self.live_plot.set_window(window_s)
         self.update_idletasks()
 
-        self.ecg_data = []
+        filters = None
+        if self.filter_var.get() != "Off":
+            mains_hz = float(self.filter_var.get().split()[0])
+            from .dsp import FilterPipeline
+            filters = FilterPipeline(hz, notch_hz=mains_hz)
+
+        recorder = None
+        self.stream_path = None
+        if self.stream_enabled_var.get():
+            ts = time.strftime('%Y%m%d_%H%M%S')
+            self.stream_path = os.path.join(self._resolve_autosave_dir(), f"ecg_stream_{ts}.h5")
+            from .recorder import StreamRecorder
+            recorder = StreamRecorder(
+                self.stream_path,
+                metadata={
+                    "target_hz": hz,
+                    "port": self.com_port_var.get(),
+                    "analog_pin": ",".join(f"a:{name[1:]}:i" for name in self.channel_names),
+                },
+            )
+            self.ecg_buffer = SampleBuffer(retain=hz * 120, channel_names=self.channel_names, filtered=filters is not None)
+            print(f"Streaming ECG data to {self.stream_path}")
+        else:
+            self.ecg_buffer = SampleBuffer(channel_names=self.channel_names, filtered=filters is not None)
 
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
         self.save_btn.config(state=tk.DISABLED)
+        self.history_btn.config(state=tk.DISABLED)
 
 
         self._scan_start_time = time.time()
         self._runtime_updating = True
         self._live_plot_updating = True
 
+        batch_queue = deque()
+        self._batch_queue = batch_queue
+        self._live_hz = float(hz)
+        window_rows = int(window_s * hz) + 1
+        self._live_raw = RingBuffer(window_rows, len(self.channel_names))
+        self.display_scaler = DisplayScaler(self.DISPLAY_SCALES.get(self.scale_var.get(), "auto"))
+        self.history_pyramid = MinMaxPyramid(len(self.channel_names))
+        self._reset_y_range()
+        self._live_filtered = RingBuffer(window_rows, len(self.channel_names)) if filters is not None else None
+
         self.update_runtime_counter()  
         self.update_live_plot()       
-
-
-        def data_callback(new_row):
-            def append_only():
-                if not self._live_plot_updating or self._scan_session_id != current_session:
-                    return
-                self.ecg_data.append(new_row) 
-            try:
-                self.after(0, append_only)
-            except Exception as e:
-                print(f"Tkinter callback scheduling error: {e}")
-
+        self._drain_batches()
+        self.after(500, self._update_stats_label)
+
+
+        session = EcgScanSession(
+            self.arduino_board,
+            target_hz=hz,
+            analog_inputs=self.analog_inputs,
+            buffer=self.ecg_buffer,
+            recorder=recorder,
+            batch_callback=batch_queue.append,
+            batch_interval_s=0.05,
+            filters=filters,
+            qrs=self._make_qrs_detector(hz),
+            pyramid=self.history_pyramid,
+        )
+        self.scan_session = session
 
         def collect():
-            data = start_ecg_scan(
-                self.arduino_board,
-                target_hz=hz,
-                analog_input=self.analog_input,
-                data_callback=data_callback
-            )
+            data = session.run()
             
             self.after(0, lambda: self._on_scan_finished(data, current_session))
 
@@ -263,11 +457,12 @@ class MountSinaiEKGApp(tk.Tk):
         if session_id != self._scan_session_id:
             return
         try:
-            self.ecg_data = data or [] 
+            if data is not None:
+                self.ecg_buffer = data
             elapsed = 0.0
             if self._scan_start_time:
                 elapsed = time.time() - self._scan_start_time
-            print(f"Scan stopped. Total samples: {len(self.ecg_data)} | Runtime: {elapsed:.2f} s")
+            print(f"Scan stopped. Total samples: {len(self.ecg_buffer)} | Runtime: {elapsed:.2f} s")
 
             self.arduino_status.config(text="Scan stopped.", fg="orange")
             self._runtime_updating = False
@@ -276,11 +471,14 @@ class MountSinaiEKGApp(tk.Tk):
             self.start_btn.config(state=tk.NORMAL)
             self.stop_btn.config(state=tk.DISABLED)
             self.save_btn.config(state=tk.NORMAL)
+            self.history_btn.config(state=tk.NORMAL)
 
+            self._drain_batches(reschedule=False)
             self.update_live_plot(force=True)
+            self._update_stats_label()
             #autoscve
             try:
-                if self.autosave_enabled_var.get() and self.ecg_data:
+                if self.autosave_enabled_var.get() and self._has_data():
                     # schedule the autosave so it runs in the Tk mainloop
                     self.after(0, lambda: self._autosave_csv())
             except Exception as e:
@@ -290,9 +488,10 @@ class MountSinaiEKGApp(tk.Tk):
 
     def stop_scan(self):
         try:
-            stop_ecg_scan()
+            if self.scan_session is not None:
+                self.scan_session.stop()
         except Exception as e:
-            print(f"Error calling stop_ecg_scan: {e}")
+            print(f"Error stopping scan session: {e}")
 
         self.arduino_status.config(text="Stopping scan...", fg="orange")
         self._runtime_updating = False
@@ -303,45 +502,85 @@ class MountSinaiEKGApp(tk.Tk):
     def update_live_plot(self, force: bool = False):
         if not self._live_plot_updating and not force:
             return
+        if self.live_plot is None:
+            return
 
-        if self.ecg_data:
-            total_samples = len(self.ecg_data)
-            start_idx = max(0, total_samples - 1000)
-
-            try:
-                hz = float(self.hz_var.get())
-                if hz <= 0:
-                    hz = 1000.0
-            except Exception:
-                hz = 1000.0
-
-            y = []
-            x = []
-            append_y = y.append
-            append_x = x.append
-
-            for i, row in enumerate(self.ecg_data[start_idx:]):
-                append_y(self._extract_display_value(row))
-                append_x((start_idx + i) / hz)
-
-            self.line.set_data(x, y)
-
-            if x:
-                xmax = x[-1]
-                if xmax <= 5:
-                    self.ax.set_xlim(0, 5)
-                else:
-                    self.ax.set_xlim(xmax - 5, xmax)
-            else:
-                self.ax.set_xlim(0, 5)
-        else:
-            self.line.set_data([], [])
-            self.ax.set_xlim(0, 5)
-
-        self.canvas.draw_idle()
+        ring = self._live_raw
+        if self._live_filtered is not None and not self.show_raw_var.get():
+            ring = self._live_filtered
+        autorange = self.autorange_var.get()
+        # filtered output is centred on zero and is drawn around the middle of the display range
+        display = self.display_scaler.apply(ring.latest(), centered=ring is self._live_filtered, clip=not autorange)
+        if autorange and time.monotonic() >= self._autorange_due:
+            self._autorange_due = time.monotonic() + 0.5
+            limits = self.y_autorange.update(display)
+            if limits is not None:
+                self.live_plot.set_ylim(*limits)
+        self.live_plot.update(display, self._live_hz)
 
         if self._live_plot_updating:
-            self.after(200, self.update_live_plot)
+            fps = self._float_setting(self.fps_var, 30.0)
+            self.after(max(1, int(1000 / fps)), self.update_live_plot)
+
+    def _make_qrs_detector(self, hz):
+        if not self.detect_beats_var.get():
+            return None
+        from .qrs import QRSDetector
+        return QRSDetector(hz)
+
+    def _reset_y_range(self):
+        self.y_autorange.reset()
+        self._autorange_due = 0.0
+        if self.live_plot is not None and not self.autorange_var.get():
+            self.live_plot.set_ylim(0, 1)
+
+    @staticmethod
+    def _float_setting(var, default):
+        try:
+            value = float(var.get())
+        except (tk.TclError, ValueError):
+            return default
+        return value if value > 0 else default
+
+    def _ensure_lines(self, count):
+        colors = ["cyan", "yellow", "magenta", "lime", "orange", "white"]
+        while len(self.lines) < count:
+            (line,) = self.ax.plot([], [], color=colors[len(self.lines) % len(colors)], linewidth=1)
+            self.lines.append(line)
+        while len(self.lines) > count:
+            self.lines.pop().remove()
+
+    def _drain_batches(self, reschedule: bool = True):
+        blocks = []
+        queue = self._batch_queue
+        while queue:
+            blocks.append(queue.popleft())
+        for block in blocks:
+            self.display_scaler.calibrate(block.values)
+            self._live_raw.extend(block.values)
+            if self._live_filtered is not None and block.filtered is not None:
+                self._live_filtered.extend(block.filtered)
+
+        if reschedule and self._live_plot_updating:
+            self.after(50, self._drain_batches)
+
+    def _update_stats_label(self):
+        session = self.scan_session
+        if session is None:
+            return
+        try:
+            self.stats_var.set(session.scan_stats.summary())
+            qrs = session.qrs
+            if qrs is not None and qrs.bpm is not None:
+                self.hr_var.set(f"HR: {qrs.bpm:.0f} bpm | RR: {qrs.rr_ms:.0f} ms | Beats: {len(qrs.peaks)}")
+            elif qrs is not None:
+                self.hr_var.set("HR: --")
+            else:
+                self.hr_var.set("")
+        except Exception as e:
+            print(f"Error updating scan stats: {e}")
+        if self._runtime_updating:
+            self.after(500, self._update_stats_label)
 
     def update_runtime_counter(self):
         if self._runtime_updating and self._scan_start_time:
@@ -357,28 +596,55 @@ class MountSinaiEKGApp(tk.Tk):
 
     def _autosave_csv(self):
         try:
-            if not self.ecg_data:
+            if not self._has_data():
                 return
             ts = time.strftime('%Y%m%d_%H%M%S')
-            filename = f"ecg_autosave_{ts}.csv"
-            autosave_dir = self.autosave_dir_var.get() or "."
-            # expanduser and make absolute
-            autosave_dir = os.path.abspath(os.path.expanduser(autosave_dir))
-            try:
-                os.makedirs(autosave_dir, exist_ok=True)
-            except Exception:
-                autosave_dir = os.getcwd()
-            filepath = os.path.join(autosave_dir, filename)
-            fieldnames = sorted(set().union(*(d.keys() for d in self.ecg_data)))
-            with open(filepath, 'w', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in self.ecg_data:
-                    writer.writerow(row)
-            print(f"Autosaved ECG data to {filepath}")
+            binary = self.autosave_format_var.get() == "HDF5"
+            filename = f"ecg_autosave_{ts}.{'h5' if binary else 'csv'}"
+            filepath = os.path.join(self._resolve_autosave_dir(), filename)
+            session = self.scan_session
+            extra = {
+                "port": self.com_port_var.get(),
+                "channels": list(self.channel_names),
+                "stream_path": self.stream_path,
+            }
+
+            def write_sidecars(path):
+                if session is None:
+                    return
+                stats_path = os.path.splitext(path)[0] + ".stats.json"
+                session.scan_stats.dump_json(stats_path, extra=extra)
+                print(f"Saved scan stats to {stats_path}")
+                qrs = session.qrs
+                if qrs is not None and qrs.peaks and binary:
+                    from .recording import write_peaks
+                    write_peaks(path, qrs.peak_indices(), qrs.peak_timestamps_ns())
+                    print(f"Saved R peaks to {path}")
+                elif qrs is not None and qrs.peaks:
+                    peaks_path = os.path.splitext(path)[0] + ".peaks.csv"
+                    with open(peaks_path, 'w', newline='') as f:
+                        writer = csv.writer(f)
+                        writer.writerow(["row_index", "timestamp_ns", "rr_ms", "bpm"])
+                        for p in qrs.peaks:
+                            writer.writerow([p.index, p.timestamp_ns, "" if p.rr_ms is None else p.rr_ms, "" if p.bpm is None else p.bpm])
+                    print(f"Saved R peaks to {peaks_path}")
+
+            self._submit_export(
+                ExportJob(self._recording_source(), filepath, after=write_sidecars, metadata=self._recording_metadata())
+            )
         except Exception as e:
             print(f"Failed to autosave CSV: {e}")
 
+    def _resolve_autosave_dir(self):
+        autosave_dir = self.autosave_dir_var.get() or "."
+        # expanduser and make absolute
+        autosave_dir = os.path.abspath(os.path.expanduser(autosave_dir))
+        try:
+            os.makedirs(autosave_dir, exist_ok=True)
+        except Exception:
+            autosave_dir = os.getcwd()
+        return autosave_dir
+
     def _browse_autosave_dir(self):
         try:
             d = filedialog.askdirectory(title="Select autosave directory")
@@ -0,0 +1,117 @@
+import tkinter as tk
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from .pyramid import MinMaxPyramid
+
+
+class HistoryWindow(tk.Toplevel):
+    """Pan/zoom view of a whole recording, drawn from a :class:`MinMaxPyramid`.
+
+    Every redraw asks the pyramid for about two points per horizontal pixel of
+    the visible range, so a frame costs the same whether it shows two seconds
+    or the full session. Use the toolbar or the mouse wheel to zoom, and the
+    arrow keys to pan.
+    """
+
+    COLORS = ["cyan", "yellow", "magenta", "lime", "orange", "white"]
+
+    def __init__(
+        self,
+        master,
+        pyramid: MinMaxPyramid,
+        sample_rate: float,
+        channel_names: Sequence[str] = ("A0",),
+        title: str = "ECG history",
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("1050x450")
+        self.configure(bg="#2e2e2e")
+        self.pyramid = pyramid
+        self.sample_rate = float(sample_rate)
+        self._on_close = on_close
+        self._refresh_pending = False
+
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        self.fig = Figure(figsize=(8, 3), dpi=100, facecolor="#2e2e2e")
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_facecolor("#222222")
+        self.ax.set_xlabel("Time (s)", color="white")
+        self.ax.set_ylabel("Value", color="white")
+        self.ax.tick_params(axis="x", colors="white")
+        self.ax.tick_params(axis="y", colors="white")
+        self.lines = [
+            self.ax.plot([], [], color=self.COLORS[i % len(self.COLORS)], linewidth=1, label=name)[0]
+            for i, name in enumerate(channel_names)
+        ]
+        if len(self.lines) > 1:
+            self.ax.legend(loc="upper right", fontsize="small")
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self)
+        self.toolbar.update()
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.duration_s = max(pyramid.rows, 1) / self.sample_rate
+        self.ax.set_xlim(0, self.duration_s)
+        self._set_full_ylim()
+        self.ax.callbacks.connect("xlim_changed", lambda ax: self._schedule_refresh())
+        self.canvas.mpl_connect("scroll_event", self._on_scroll)
+        self.canvas.mpl_connect("resize_event", lambda event: self._schedule_refresh())
+        self.bind("<Left>", lambda event: self.pan(-0.25))
+        self.bind("<Right>", lambda event: self.pan(0.25))
+        self.bind("<Home>", lambda event: self.ax.set_xlim(0, self.duration_s))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def _set_full_ylim(self):
+        _, values = self.pyramid.query(0, self.pyramid.rows, max_points=256)
+        if len(values) == 0:
+            return
+        lo, hi = float(values.min()), float(values.max())
+        pad = 0.05 * (hi - lo) or 0.5
+        self.ax.set_ylim(lo - pad, hi + pad)
+
+    def _schedule_refresh(self):
+        # pan/zoom fires many limit changes in a row; redraw once they settle
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        self._refresh_pending = False
+        left, right = self.ax.get_xlim()
+        start = int(np.floor(left * self.sample_rate))
+        stop = int(np.ceil(right * self.sample_rate)) + 1
+        max_points = max(200, int(2 * self.ax.bbox.width))
+        rows, values = self.pyramid.query(start, stop, max_points=max_points)
+        x = rows / self.sample_rate
+        for ch, line in enumerate(self.lines):
+            line.set_data(x, values[:, ch] if len(values) else [])
+        self.canvas.draw_idle()
+
+    def pan(self, fraction: float):
+        left, right = self.ax.get_xlim()
+        shift = (right - left) * fraction
+        self.ax.set_xlim(left + shift, right + shift)
+
+    def _on_scroll(self, event):
+        if event.xdata is None:
+            return
+        scale = 0.8 if event.button == "up" else 1.25
+        left, right = self.ax.get_xlim()
+        center = event.xdata
+        self.ax.set_xlim(center - (center - left) * scale, center + (right - center) * scale)
+
+    def close(self):
+        if self._on_close is not None:
+            try:
+                self._on_close()
+            except Exception as e:
+                print(f"Error closing history source: {e}")
+        self.destroy()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+VELOCITY_DATASET = '/SignalsArterialVelocity_y'
+
+
+def _scalar(dataset) -> float:
+    value = dataset[()]
+    value = np.asarray(value).ravel()
+    return float(value[0])
+
+
+class HoloSource:
+    """An open holo HDF5 file that reads only what is asked for.
+
+    The Unix start/end timestamps are read when the file opens; datasets are
+    sliced on demand, so the velocity signal never has to be loaded whole to
+    trim an ECG against it. Close it explicitly or use it as a context manager.
+    """
+
+    def __init__(self, path: str):
+        import h5py
+
+        self.path = path
+        self._h5 = h5py.File(path, 'r')
+        try:
+            self.unix_first = _scalar(self._h5['/UnixTimestampFirst'])
+            self.unix_last = _scalar(self._h5['/UnixTimestampLast'])
+        except Exception as e:
+            self._h5.close()
+            raise RuntimeError(f"Failed to read UnixTimestampFirst/Last: {e}")
+
+    @property
+    def closed(self) -> bool:
+        return not self._h5.id.valid
+
+    def close(self) -> None:
+        if not self.closed:
+            self._h5.close()
+
+    def __enter__(self) -> 'HoloSource':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"HoloSource({self.path!r}{', closed' if self.closed else ''})"
+
+    def has(self, name: str) -> bool:
+        return name in self._h5
+
+    def length(self, name: str = VELOCITY_DATASET) -> int:
+        """Row count of a dataset without reading it; 0 if it is missing."""
+        if name not in self._h5:
+            return 0
+        shape = self._h5[name].shape
+        return int(shape[0]) if shape else 1
+
+    def read(self, name: str = VELOCITY_DATASET, start: Optional[int] = None, stop: Optional[int] = None) -> Optional[np.ndarray]:
+        """Rows ``start:stop`` of a dataset, or None if the file has no such dataset."""
+        if name not in self._h5:
+            return None
+        dataset = self._h5[name]
+        if not dataset.shape:
+            return np.asarray(dataset[()])
+        return np.asarray(dataset[slice(start, stop)])
+
+    def duration_s(self) -> Optional[float]:
+        if self.unix_last > self.unix_first:
+            return (self.unix_last - self.unix_first) / 1_000_000.0
+        return None
+
+
+class HoloSourcePool:
+    """Keep up to ``max_open`` holo files open for reuse during a batch.
+
+    The least recently used file is closed when the pool is full. Sources
+    handed out by the pool belong to it; close the pool, not the source.
+    """
+
+    def __init__(self, max_open: int = 4):
+        self.max_open = max(1, int(max_open))
+        self._open: 'OrderedDict[str, HoloSource]' = OrderedDict()
+
+    def get(self, path: str) -> HoloSource:
+        key = os.path.abspath(path)
+        source = self._open.pop(key, None)
+        if source is None or source.closed:
+            source = HoloSource(path)
+        self._open[key] = source
+        while len(self._open) > self.max_open:
+            _, oldest = self._open.popitem(last=False)
+            oldest.close()
+        return source
+
+    def close(self) -> None:
+        while self._open:
+            _, source = self._open.popitem()
+            source.close()
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def __enter__(self) -> 'HoloSourcePool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
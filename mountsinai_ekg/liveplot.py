@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity float32 ring of ``(rows, channels)`` samples.
+
+    Every row is written twice, at ``i`` and ``i + capacity``, so the newest
+    ``capacity`` rows are always available as one contiguous view.
+    """
+
+    def __init__(self, capacity: int, n_channels: int = 1):
+        self.capacity = max(1, int(capacity))
+        self.n_channels = max(1, int(n_channels))
+        self._data = np.zeros((2 * self.capacity, self.n_channels), dtype=np.float32)
+        self._head = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def clear(self) -> None:
+        self._head = 0
+        self.total = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float32).reshape(-1, self.n_channels)
+        cap = self.capacity
+        self.total += len(values)
+        if len(values) > cap:
+            values = values[-cap:]
+        n = len(values)
+        head = self._head
+        first = min(n, cap - head)
+        self._data[head:head + first] = values[:first]
+        self._data[head + cap:head + cap + first] = values[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = values[first:]
+            self._data[cap:cap + rest] = values[first:]
+        self._head = (head + n) % cap
+
+    def latest(self) -> np.ndarray:
+        # oldest to newest; a view, valid until the next extend()
+        n = len(self)
+        end = self._head + self.capacity
+        return self._data[end - n:end]
+
+
+# full-scale reading of each supported input range; "unit" is pyfirmata's 0..1 normalized reading
+INPUT_SCALES = {"unit": 1.0, "volts": 5.0, "adc10": 1023.0, "adc12": 4095.0}
+
+
+def detect_input_scale(values: np.ndarray) -> str:
+    """Guess which input range ``values`` come from, using a robust peak."""
+    v = np.asarray(values, dtype=np.float64)
+    if v.size == 0:
+        return "unit"
+    peak = float(np.percentile(np.abs(v), 99))
+    if peak <= 1.5:
+        return "unit"
+    if peak <= 6.0:
+        return "volts"
+    if peak <= 2048:
+        return "adc10"
+    return "adc12"
+
+
+class DisplayScaler:
+    """Map raw readings to the 0..1 display range with one vectorized operation.
+
+    The input range is either configured (one of :data:`INPUT_SCALES`) or, for
+    ``"auto"``, detected once per session from the first ``detect_rows``
+    samples and then kept, so the scale can't flip from sample to sample.
+    Zero-centred (filtered) signals are drawn around 0.5.
+    """
+
+    def __init__(self, scale: str = "auto", detect_rows: int = 200):
+        if scale != "auto" and scale not in INPUT_SCALES:
+            raise ValueError(f"Unknown input scale: {scale}")
+        self.scale = scale
+        self.detect_rows = int(detect_rows)
+        self.detected: Optional[str] = None if scale == "auto" else scale
+        self._seen: List[np.ndarray] = []
+        self._seen_rows = 0
+
+    @property
+    def calibrated(self) -> bool:
+        return self.detected is not None
+
+    @property
+    def full_scale(self) -> float:
+        if self.detected is not None:
+            return INPUT_SCALES[self.detected]
+        if self._seen:
+            return INPUT_SCALES[detect_input_scale(np.concatenate(self._seen))]
+        return 1.0
+
+    def calibrate(self, values: np.ndarray) -> None:
+        if self.detected is not None:
+            return
+        values = np.asarray(values).ravel()
+        self._seen.append(values)
+        self._seen_rows += len(values)
+        if self._seen_rows >= self.detect_rows:
+            self.detected = detect_input_scale(np.concatenate(self._seen))
+            self._seen = []
+
+    def apply(self, values: np.ndarray, centered: bool = False, clip: bool = True) -> np.ndarray:
+        out = np.asarray(values, dtype=np.float32) * np.float32(1.0 / self.full_scale)
+        if centered:
+            out += np.float32(0.5)
+        if clip:
+            np.clip(out, 0.0, 1.0, out=out)
+        return out
+
+
+class AutoRange:
+    """Y limits that follow rolling percentiles of the visible window.
+
+    Limits only change when the data leaves them or shrinks to well under
+    half of them, so the cached plot background is rebuilt rarely.
+    """
+
+    def __init__(self, low_pct: float = 1.0, high_pct: float = 99.0, margin: float = 0.15, min_span: float = 0.02):
+        self.low_pct = float(low_pct)
+        self.high_pct = float(high_pct)
+        self.margin = float(margin)
+        self.min_span = float(min_span)
+        self.limits: Optional[Tuple[float, float]] = None
+
+    def reset(self) -> None:
+        self.limits = None
+
+    def update(self, values: np.ndarray) -> Optional[Tuple[float, float]]:
+        """Return new ``(bottom, top)`` limits, or ``None`` if the current ones still fit."""
+        if len(values) == 0:
+            return None
+        lo, hi = np.percentile(values, [self.low_pct, self.high_pct])
+        mid = (lo + hi) / 2.0
+        span = max(hi - lo, self.min_span)
+        lo, hi = mid - span / 2.0, mid + span / 2.0
+        if self.limits is not None:
+            bottom, top = self.limits
+            if bottom <= lo and hi <= top and (top - bottom) < 2.5 * span * (1 + 2 * self.margin):
+                return None
+        self.limits = (float(lo - self.margin * span), float(hi + self.margin * span))
+        return self.limits
+
+
+def _minmax_decimate(y: np.ndarray, max_points: int) -> tuple:
+    """Reduce ``y`` to about ``max_points`` points keeping each bucket's min and max."""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n, dtype=np.float64), y
+    k = int(np.ceil(2 * n / max_points))
+    usable = (n // k) * k
+    start = n - usable
+    buckets = y[start:].reshape(-1, k, y.shape[1])
+    lo = buckets.min(axis=1)
+    hi = buckets.max(axis=1)
+    out = np.empty((2 * len(lo), y.shape[1]), dtype=y.dtype)
+    out[0::2] = lo
+    out[1::2] = hi
+    x = start + np.repeat(np.arange(len(lo)) * k, 2) + np.tile([0, k - 1], len(lo))
+    return x.astype(np.float64), out
+
+
+class LivePlot:
+    """Scrolling ECG view that redraws only its line artists using blitting.
+
+    The axes, ticks and labels are rendered once and cached as a background
+    bitmap; each frame restores that bitmap, updates the lines and blits the
+    axes region. The x axis shows seconds relative to the newest sample, so
+    the background never has to change while the trace scrolls. Long windows
+    are min/max decimated to ``max_points`` so the per-frame cost does not
+    grow with the sampling rate.
+    """
+
+    def __init__(self, canvas, ax, lines: Sequence, window_s: float = 5.0, max_points: int = 4000):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines: List = []
+        self.window_s = float(window_s)
+        self.max_points = int(max_points)
+        self._background = None
+        self.set_lines(lines)
+        self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def set_lines(self, lines: Sequence) -> None:
+        self.lines = list(lines)
+        for line in self.lines:
+            line.set_animated(True)
+
+    def set_window(self, window_s: float) -> None:
+        self.window_s = float(window_s)
+        self.reset()
+
+    def reset(self) -> None:
+        for line in self.lines:
+            line.set_data([], [])
+        self.ax.set_xlim(-self.window_s, 0)
+        # a full redraw renders the static parts; _on_draw then recaptures the background
+        self._background = None
+        self.canvas.draw_idle()
+
+    def set_ylim(self, bottom: float, top: float) -> None:
+        # tick labels are part of the background, so changing limits needs a full redraw
+        self.ax.set_ylim(bottom, top)
+        self._background = None
+        self.canvas.draw_idle()
+
+    def _on_draw(self, event=None) -> None:
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def update(self, values: np.ndarray, sample_rate: float) -> None:
+        """Show ``values`` (oldest to newest, ``(rows, channels)``) ending at t=0."""
+        if len(values) == 0:
+            for line in self.lines:
+                line.set_data([], [])
+        else:
+            x, y = _minmax_decimate(values, self.max_points)
+            x = (x - (len(values) - 1)) / float(sample_rate)
+            for ch, line in enumerate(self.lines):
+                line.set_data(x, y[:, min(ch, y.shape[1] - 1)])
+        self.blit()
+
+    def blit(self) -> None:
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class _Level:
+    __slots__ = ("mins", "maxs", "length", "carry_min", "carry_max")
+
+    def __init__(self, n_channels: int, capacity: int = 64):
+        self.mins = np.empty((capacity, n_channels), dtype=np.float32)
+        self.maxs = np.empty((capacity, n_channels), dtype=np.float32)
+        self.length = 0
+        # inputs that do not fill a whole bucket yet
+        self.carry_min = np.empty((0, n_channels), dtype=np.float32)
+        self.carry_max = np.empty((0, n_channels), dtype=np.float32)
+
+    def append(self, mins: np.ndarray, maxs: np.ndarray) -> None:
+        need = self.length + len(mins)
+        if need > len(self.mins):
+            capacity = max(need, 2 * len(self.mins))
+            grown_min = np.empty((capacity, self.mins.shape[1]), dtype=np.float32)
+            grown_max = np.empty_like(grown_min)
+            grown_min[:self.length] = self.mins[:self.length]
+            grown_max[:self.length] = self.maxs[:self.length]
+            # swap in whole arrays so a concurrent reader never sees a half-copied level
+            self.mins, self.maxs = grown_min, grown_max
+        self.mins[self.length:need] = mins
+        self.maxs[self.length:need] = maxs
+        self.length = need
+
+
+class MinMaxPyramid:
+    """Multi-resolution min/max summary of a growing recording.
+
+    Level ``k`` (k >= 1) stores the minimum and maximum of every
+    ``factor ** k`` consecutive rows. Each :meth:`extend` only folds the new
+    rows into the levels, so the scan loop can keep the pyramid current at a
+    constant cost per sample. :meth:`query` picks the coarsest level that
+    still gives about ``max_points`` points for the requested row range, which
+    keeps drawing cost flat at any zoom and any recording length. Row ranges
+    finer than level 1 are read from ``raw`` when it is given.
+    """
+
+    def __init__(
+        self,
+        n_channels: int = 1,
+        factor: int = 8,
+        max_levels: int = 10,
+        raw: Optional[Callable[[int, int], np.ndarray]] = None,
+    ):
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+        self.n_channels = max(1, int(n_channels))
+        self.factor = int(factor)
+        self.max_levels = int(max_levels)
+        self.raw = raw
+        self.rows = 0
+        self.levels: List[_Level] = [_Level(self.n_channels) for _ in range(self.max_levels)]
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, **kwargs) -> "MinMaxPyramid":
+        values = np.asarray(values, dtype=np.float32)
+        pyramid = cls(n_channels=1 if values.ndim == 1 else values.shape[1], **kwargs)
+        pyramid.extend(values)
+        return pyramid
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float32).reshape(-1, self.n_channels)
+        if len(values) == 0:
+            return
+        self.rows += len(values)
+        mins = maxs = values
+        for level in self.levels:
+            lo = np.concatenate((level.carry_min, mins))
+            hi = np.concatenate((level.carry_max, maxs))
+            full = (len(lo) // self.factor) * self.factor
+            level.carry_min = lo[full:]
+            level.carry_max = hi[full:]
+            if full == 0:
+                break
+            mins = lo[:full].reshape(-1, self.factor, self.n_channels).min(axis=1)
+            maxs = hi[:full].reshape(-1, self.factor, self.n_channels).max(axis=1)
+            level.append(mins, maxs)
+
+    def level_for(self, start: int, stop: int, max_points: int) -> int:
+        # each bucket draws as two points
+        span = max(1, stop - start)
+        depth = 0
+        while depth < len(self.levels) and self.levels[depth].length and span / self.factor ** depth > max_points / 2:
+            depth += 1
+        if depth == 0 and self.raw is None and self.levels[0].length:
+            depth = 1
+        return depth
+
+    def query(self, start: int, stop: int, max_points: int = 4000) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(row_index, values)`` for rows ``[start, stop)`` at a fitting resolution.
+
+        ``values`` is ``(points, channels)``; coarse levels interleave each
+        bucket's min and max so spikes survive decimation.
+        """
+        start = max(0, int(start))
+        stop = min(self.rows, int(stop))
+        if stop <= start:
+            return np.empty(0), np.empty((0, self.n_channels), dtype=np.float32)
+        depth = self.level_for(start, stop, max_points)
+        if depth == 0:
+            if self.raw is None:
+                return np.empty(0), np.empty((0, self.n_channels), dtype=np.float32)
+            values = np.asarray(self.raw(start, stop), dtype=np.float32).reshape(-1, self.n_channels)
+            return np.arange(start, start + len(values), dtype=np.float64), values
+        level = self.levels[depth - 1]
+        size = self.factor ** depth
+        first = start // size
+        last = min(level.length, -(-stop // size))
+        mins = level.mins[first:last]
+        maxs = level.maxs[first:last]
+        out = np.empty((2 * len(mins), self.n_channels), dtype=np.float32)
+        out[0::2] = mins
+        out[1::2] = maxs
+        bucket_start = (np.arange(first, last, dtype=np.float64) * size)
+        x = np.repeat(bucket_start, 2)
+        x[1::2] += size - 1
+        return x, out
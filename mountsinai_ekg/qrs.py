@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from scipy import signal
+
+from .buffer import SampleBlock
+
+
+class RPeak(NamedTuple):
+    index: int
+    timestamp_ns: int
+    rr_ms: Optional[float]
+    bpm: Optional[float]
+
+
+class QRSDetector:
+    """Incremental Pan-Tompkins QRS detector.
+
+    Blocks from the scan loop go through the classic chain (5-15 Hz bandpass,
+    five-point derivative, squaring, 150 ms moving-window integration) with
+    filter and window state carried between blocks, so the work per sample is
+    constant. Local maxima of the integrated signal are classified as QRS or
+    noise with the adaptive SPKI/NPKI thresholds and RR-based searchback, and
+    each beat is placed at the bandpass maximum inside its integration window.
+    """
+
+    def __init__(
+        self,
+        fs: float,
+        channel: int = 0,
+        learn_s: float = 2.0,
+        refractory_s: float = 0.2,
+        window_s: float = 0.15,
+        rr_history: int = 8,
+    ):
+        self.fs = float(fs)
+        self.channel = int(channel)
+        self.learn_samples = int(learn_s * self.fs)
+        self.refractory = max(1, int(refractory_s * self.fs))
+        self.window = max(1, int(window_s * self.fs))
+        self.sos = signal.butter(1, [5.0, min(15.0, 0.45 * self.fs)], btype="bandpass", fs=self.fs, output="sos")
+        self.peaks: List[RPeak] = []
+        self._rr_ms: "deque[float]" = deque(maxlen=rr_history)
+        self._zi: Optional[np.ndarray] = None
+        self._deriv_tail = np.zeros(4)
+        self._mwi_tail = np.zeros(self.window)
+        self._mwi_carry = np.empty(0)
+        self._count = 0
+        self._origin: Optional[int] = None
+        # recent bandpassed samples and their timestamps, for locating the R wave; rings indexed
+        # by sample count modulo their length, so a block costs its own size and not the history's
+        history = self.window + int(2.0 * self.fs)
+        self._bp_hist = np.zeros(history)
+        self._ts_hist = np.zeros(history, dtype=np.int64)
+        self._learn_max = 0.0
+        self._learn_sum = 0.0
+        self._learn_n = 0
+        self._spki = 0.0
+        self._npki = 0.0
+        self._learned = False
+        self._last_qrs: Optional[int] = None
+        self._pending: List[tuple] = []
+
+    @property
+    def threshold(self) -> float:
+        return self._npki + 0.25 * (self._spki - self._npki)
+
+    @property
+    def rr_ms(self) -> Optional[float]:
+        return self._rr_ms[-1] if self._rr_ms else None
+
+    @property
+    def bpm(self) -> Optional[float]:
+        if not self._rr_ms:
+            return None
+        return 60_000.0 / (sum(self._rr_ms) / len(self._rr_ms))
+
+    def peak_indices(self) -> np.ndarray:
+        return np.array([p.index for p in self.peaks], dtype=np.int64)
+
+    def peak_timestamps_ns(self) -> np.ndarray:
+        return np.array([p.timestamp_ns for p in self.peaks], dtype=np.int64)
+
+    def process(self, block: SampleBlock) -> List[RPeak]:
+        n = len(block)
+        if n == 0:
+            return []
+        x = block.channel(self.channel).astype(np.float64)
+        if self._origin is None:
+            self._origin = block.start
+        if self._zi is None:
+            self._zi = signal.sosfilt_zi(self.sos) * x[0]
+        bp, self._zi = signal.sosfilt(self.sos, x, zi=self._zi)
+
+        ext = np.concatenate((self._deriv_tail, bp))
+        deriv = (2 * ext[4:] + ext[3:-1] - ext[1:-3] - 2 * ext[:-4]) / 8.0
+        self._deriv_tail = ext[-4:]
+        sq = deriv * deriv
+        csum = np.cumsum(np.concatenate((self._mwi_tail, sq)))
+        mwi = (csum[self.window:] - csum[:-self.window]) / self.window
+        self._mwi_tail = np.concatenate((self._mwi_tail, sq))[-self.window:]
+
+        start = self._count
+        self._store_history(start, bp, block.timestamp_ns)
+        self._count += n
+        if not self._learned:
+            self._learn(mwi)
+
+        # local maxima need a right neighbour, so the last two samples wait for the next block
+        carry_start = start - len(self._mwi_carry)
+        z = np.concatenate((self._mwi_carry, mwi))
+        self._mwi_carry = z[-2:]
+        if len(z) < 3:
+            return []
+        mid = z[1:-1]
+        candidates = np.flatnonzero((mid > z[:-2]) & (mid >= z[2:])) + 1
+        found: List[RPeak] = []
+        for i in candidates:
+            peak = self._classify(carry_start + int(i), float(z[i]))
+            if peak is not None:
+                found.append(peak)
+        peak = self._searchback()
+        if peak is not None:
+            found.append(peak)
+        return found
+
+    def _store_history(self, start: int, bp: np.ndarray, timestamp_ns: np.ndarray) -> None:
+        size = len(self._bp_hist)
+        if len(bp) > size:
+            start += len(bp) - size
+            bp, timestamp_ns = bp[-size:], timestamp_ns[-size:]
+        pos = np.arange(start, start + len(bp)) % size
+        self._bp_hist[pos] = bp
+        self._ts_hist[pos] = timestamp_ns
+
+    def _learn(self, mwi: np.ndarray) -> None:
+        take = mwi[: max(0, self.learn_samples - self._learn_n)]
+        if len(take):
+            self._learn_max = max(self._learn_max, float(take.max()))
+            self._learn_sum += float(take.sum())
+            self._learn_n += len(take)
+        if self._learn_n >= self.learn_samples:
+            self._spki = self._learn_max / 3.0
+            self._npki = 0.5 * self._learn_sum / max(1, self._learn_n)
+            self._learned = True
+
+    def _classify(self, index: int, value: float) -> Optional[RPeak]:
+        if not self._learned or index < self.learn_samples:
+            return None
+        if self._last_qrs is not None and index - self._last_qrs < self.refractory:
+            self._npki = 0.125 * value + 0.875 * self._npki
+            return None
+        if value > self.threshold:
+            self._spki = 0.125 * value + 0.875 * self._spki
+            return self._accept(index)
+        self._npki = 0.125 * value + 0.875 * self._npki
+        self._pending.append((index, value))
+        return None
+
+    def _searchback(self) -> Optional[RPeak]:
+        # a missed beat: no QRS for 1.66x the mean RR, so accept the best noise peak above half threshold
+        if not self._rr_ms or self._last_qrs is None or not self._pending:
+            return None
+        rr_samples = np.mean(self._rr_ms) * self.fs / 1000.0
+        if self._count - self._last_qrs < 1.66 * rr_samples:
+            return None
+        index, value = max(self._pending, key=lambda p: p[1])
+        if value <= 0.5 * self.threshold or index - self._last_qrs < self.refractory:
+            self._pending = []
+            return None
+        self._spki = 0.25 * value + 0.75 * self._spki
+        return self._accept(index)
+
+    def _accept(self, index: int) -> RPeak:
+        self._pending = []
+        # the integrated peak lags the R wave; take the bandpass maximum inside the window
+        size = len(self._bp_hist)
+        lo = max(index - self.window - 2, self._count - size, (self._last_qrs or 0) + 1)
+        hi = max(lo + 1, min(index + 1, self._count))
+        segment = np.abs(self._bp_hist[np.arange(lo, min(hi, self._count)) % size])
+        r_index = lo + int(np.argmax(segment)) if len(segment) else index
+        r_ts = int(self._ts_hist[min(r_index, self._count - 1) % size])
+        rr = None
+        if self.peaks:
+            rr = (r_ts - self.peaks[-1].timestamp_ns) / 1_000_000
+            if rr > 0:
+                self._rr_ms.append(rr)
+        self._last_qrs = index
+        peak = RPeak(self._origin + r_index, r_ts, rr, self.bpm)
+        self.peaks.append(peak)
+        return peak
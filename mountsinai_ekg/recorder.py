@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import h5py
+import numpy as np
+
+from .buffer import SampleBlock
+
+# (dataset name, SampleBlock attribute, dtype)
+_COLUMNS = (
+    ("sample_num", "sample_num", np.int64),
+    ("analog_value", "values", np.float32),
+    ("timestamp_ns", "timestamp_ns", np.int64),
+)
+_FILTERED_COLUMN = ("filtered_value", "filtered", np.float32)
+# R-peak row indices and timestamps, appended as the QRS detector finds beats
+_PEAK_COLUMNS = ("r_peak_index", "r_peak_ns")
+# first row index after each SampleClock re-anchor (a dropout) and the size of the step in ns
+_CLOCK_STEP_COLUMNS = ("clock_step_index", "clock_step_ns")
+
+
+class StreamRecorder:
+    """Append scan blocks to a chunked, resizable HDF5 file from a writer thread.
+
+    The file is written in SWMR mode and flushed after every chunk, so whatever
+    reached disk before a crash or power loss can still be read back with
+    :func:`read_recording`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_rows: int = 4096,
+        flush_interval_s: float = 1.0,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.path = path
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.flush_interval_s = float(flush_interval_s)
+        self.metadata = dict(metadata or {})
+        self.rows_written = 0
+        self.error: Optional[BaseException] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._h5: Optional[h5py.File] = None
+        self._columns = _COLUMNS
+
+    def open(
+        self,
+        channel_names: Optional[Sequence[str]] = None,
+        filtered: bool = False,
+        peaks: bool = False,
+        clock_steps: bool = False,
+    ) -> None:
+        if self._thread is not None:
+            return
+        channel_names = list(channel_names or ["A0"])
+        self._columns = _COLUMNS + ((_FILTERED_COLUMN,) if filtered else ())
+        h5f = h5py.File(self.path, "w", libver="latest")
+        for name, _, dtype in self._columns:
+            # multi-channel values are stored as one (rows, channels) dataset
+            per_channel = name in ("analog_value", "filtered_value")
+            extra = (len(channel_names),) if per_channel and len(channel_names) > 1 else ()
+            h5f.create_dataset(
+                name,
+                shape=(0,) + extra,
+                maxshape=(None,) + extra,
+                dtype=dtype,
+                chunks=(self.chunk_rows,) + extra,
+            )
+        events = (_PEAK_COLUMNS if peaks else ()) + (_CLOCK_STEP_COLUMNS if clock_steps else ())
+        for name in events:
+            h5f.create_dataset(name, shape=(0,), maxshape=(None,), dtype=np.int64, chunks=(256,))
+        h5f.attrs["format"] = "mountsinai_ekg.recording"
+        h5f.attrs["channel_names"] = channel_names
+        h5f.attrs["complete"] = False
+        for key, value in self.metadata.items():
+            h5f.attrs[key] = value
+        h5f.swmr_mode = True
+        self._h5 = h5f
+        self._thread = threading.Thread(target=self._run, name="ecg-recorder", daemon=True)
+        self._thread.start()
+
+    def submit(self, block: SampleBlock) -> None:
+        if len(block) and self.error is None:
+            self._queue.put(block)
+
+    def submit_peaks(self, indices: Sequence[int], timestamps_ns: Sequence[int]) -> None:
+        if len(indices) and self.error is None:
+            self._queue.put((_PEAK_COLUMNS, np.asarray(indices, dtype=np.int64), np.asarray(timestamps_ns, dtype=np.int64)))
+
+    def submit_clock_steps(self, indices: Sequence[int], steps_ns: Sequence[int]) -> None:
+        if len(indices) and self.error is None:
+            self._queue.put((_CLOCK_STEP_COLUMNS, np.asarray(indices, dtype=np.int64), np.asarray(steps_ns, dtype=np.int64)))
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        try:
+            # attributes cannot change under SWMR, so mark completion after reopening
+            with h5py.File(self.path, "a", libver="latest") as h5f:
+                h5f.attrs["complete"] = True
+                h5f.attrs["rows"] = self.rows_written
+        except Exception as e:
+            print(f"Failed to finalize recording {self.path}: {e}")
+
+    def __enter__(self) -> "StreamRecorder":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        pending: List[SampleBlock] = []
+        pending_rows = 0
+        last_flush = time.monotonic()
+        done = False
+        try:
+            while not done:
+                try:
+                    block = self._queue.get(timeout=self.flush_interval_s)
+                except queue.Empty:
+                    block = False
+                if block is None:
+                    done = True
+                elif isinstance(block, tuple):
+                    self._write_events(*block)
+                elif block is not False:
+                    pending.append(block)
+                    pending_rows += len(block)
+                due = time.monotonic() - last_flush >= self.flush_interval_s
+                if pending and (done or due or pending_rows >= self.chunk_rows):
+                    self._write(pending)
+                    pending = []
+                    pending_rows = 0
+                    last_flush = time.monotonic()
+        except Exception as e:
+            self.error = e
+            print(f"Recorder failed writing {self.path}: {e}")
+        finally:
+            try:
+                self._h5.close()
+            except Exception:
+                pass
+
+    def _write(self, blocks: List[SampleBlock]) -> None:
+        h5f = self._h5
+        start = self.rows_written
+        stop = start + sum(len(b) for b in blocks)
+        for name, attr, _ in self._columns:
+            ds = h5f[name]
+            ds.resize(stop, axis=0)
+            ds[start:stop] = np.concatenate([getattr(b, attr) for b in blocks])
+            ds.flush()
+        self.rows_written = stop
+
+
+    def _write_events(self, names, indices: np.ndarray, values: np.ndarray) -> None:
+        h5f = self._h5
+        if names[0] not in h5f:
+            return
+        for name, data in zip(names, (indices, values)):
+            ds = h5f[name]
+            start = ds.shape[0]
+            ds.resize(start + len(data), axis=0)
+            ds[start:] = data
+            ds.flush()
+
+
+def read_peaks(path: str):
+    """Return ``(row_indices, timestamps_ns)`` of the R peaks stored with a recording."""
+    with h5py.File(path, "r", libver="latest", swmr=True) as h5f:
+        if _PEAK_COLUMNS[0] not in h5f:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        for name in _PEAK_COLUMNS:
+            h5f[name].refresh()
+        n = min(len(h5f[name]) for name in _PEAK_COLUMNS)
+        return h5f[_PEAK_COLUMNS[0]][:n], h5f[_PEAK_COLUMNS[1]][:n]
+
+
+def read_clock_steps(path: str):
+    """Return ``(row_indices, steps_ns)`` of the clock re-anchors stored with a recording."""
+    with h5py.File(path, "r", libver="latest", swmr=True) as h5f:
+        if _CLOCK_STEP_COLUMNS[0] not in h5f:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        for name in _CLOCK_STEP_COLUMNS:
+            h5f[name].refresh()
+        n = min(len(h5f[name]) for name in _CLOCK_STEP_COLUMNS)
+        return h5f[_CLOCK_STEP_COLUMNS[0]][:n], h5f[_CLOCK_STEP_COLUMNS[1]][:n]
+
+
+def decode_counts(counts: np.ndarray, scale: float, decimals: Optional[int] = None, dtype=np.float32) -> np.ndarray:
+    """Turn uint16 ADC counts stored by :func:`save_recording` back into float32 (or ``dtype``) values.
+
+    Decoded to float64, a value is the same double the CSV export's text
+    (e.g. ``0.2326``) parses to.
+    """
+    values = counts.astype(np.float64) * scale
+    if decimals is not None:
+        values = np.round(values, decimals)
+    return values.astype(dtype, copy=False)
+
+
+def read_recording(path: str, value_dtype=np.float32) -> SampleBlock:
+    """Read a streamed or saved recording; rows cut short by a crash are dropped.
+
+    ``value_dtype=np.float64`` decodes stored counts straight to float64
+    (float32 values are widened), as the sync loader wants them.
+    """
+    with h5py.File(path, "r", libver="latest", swmr=True) as h5f:
+        columns = [name for name, _, _ in _COLUMNS + (_FILTERED_COLUMN,) if name in h5f]
+        for name in columns:
+            h5f[name].refresh()
+        # a crash can land between column writes; only trust rows present in all of them
+        n = min(len(h5f[name]) for name in columns)
+        channel_names = [str(c) for c in h5f.attrs.get("channel_names", ["A0"])]
+        values = h5f["analog_value"][:n]
+        if "value_scale" in h5f.attrs:
+            decimals = h5f.attrs.get("value_decimals")
+            values = decode_counts(
+                values, float(h5f.attrs["value_scale"]), None if decimals is None else int(decimals), value_dtype,
+            )
+        else:
+            values = values.astype(value_dtype, copy=False)
+        return SampleBlock(
+            0,
+            h5f["sample_num"][:n],
+            values,
+            h5f["timestamp_ns"][:n],
+            channel_names,
+            h5f["filtered_value"][:n] if "filtered_value" in h5f else None,
+        )
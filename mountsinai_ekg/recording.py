@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import datetime
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+
+from .buffer import SampleBlock
+from .recorder import _FILTERED_COLUMN, _PEAK_COLUMNS, decode_counts, read_peaks, read_recording  # noqa: F401
+
+# uint16 encodings tried for the raw values: (scale, decimals) with value = round(count * scale, decimals).
+# pyfirmata2 reports count / 1023 rounded to 4 decimals; plain integer counts use scale 1.
+_COUNT_ENCODINGS = ((1.0 / 1023.0, 4), (1.0, None))
+
+
+def software_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("mountsinai-ekg")
+    except Exception:
+        from . import __version__
+        return __version__
+
+
+def encode_counts(values: np.ndarray) -> Optional[Tuple[np.ndarray, float, Optional[int]]]:
+    """Return ``(uint16 counts, scale, decimals)`` if that round-trips ``values`` exactly."""
+    values = np.asarray(values, dtype=np.float32)
+    for scale, decimals in _COUNT_ENCODINGS:
+        counts = np.rint(values.astype(np.float64) / scale)
+        if len(counts) and (counts.min() < 0 or counts.max() > np.iinfo(np.uint16).max):
+            continue
+        counts = counts.astype(np.uint16)
+        if np.array_equal(decode_counts(counts, scale, decimals), values):
+            return counts, scale, decimals
+    return None
+
+
+def save_recording(
+    block: SampleBlock,
+    path: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    compression: Optional[str] = "gzip",
+    value_encoding: str = "auto",
+    peaks: Optional[Tuple[Sequence[int], Sequence[int]]] = None,
+    chunk_rows: int = 65536,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> int:
+    """Write ``block`` as a self-contained HDF5 recording.
+
+    The layout is the one :class:`StreamRecorder` produces, so
+    :func:`read_recording` and everything built on it reads both. Raw values
+    are stored as uint16 ADC counts when that is lossless (``"auto"``) or
+    requested (``"uint16"``), otherwise as float32. ``compression`` is any
+    h5py filter name, or ``None``.
+    """
+    if value_encoding not in ("auto", "uint16", "float32"):
+        raise ValueError(f"Unknown value encoding {value_encoding!r}")
+    n = len(block)
+    values = block.values
+    encoded = None
+    if value_encoding != "float32":
+        encoded = encode_counts(values)
+        if encoded is None and value_encoding == "uint16":
+            print("Values are not integer ADC counts; storing them as float32")
+    data = {
+        "sample_num": block.sample_num.astype(np.int64, copy=False),
+        "analog_value": encoded[0] if encoded is not None else values.astype(np.float32, copy=False),
+        "timestamp_ns": block.timestamp_ns.astype(np.int64, copy=False),
+    }
+    if block.filtered is not None:
+        data[_FILTERED_COLUMN[0]] = block.filtered.astype(np.float32, copy=False)
+    chunk_rows = max(1, min(int(chunk_rows), n or 1))
+    filters = {"compression": compression, "shuffle": True} if compression else {}
+
+    with h5py.File(path, "w", libver="latest") as h5f:
+        datasets = {
+            name: h5f.create_dataset(
+                name,
+                shape=column.shape,
+                maxshape=(None,) + column.shape[1:],
+                dtype=column.dtype,
+                chunks=(chunk_rows,) + column.shape[1:],
+                **filters,
+            )
+            for name, column in data.items()
+        }
+        for start in range(0, n, chunk_rows):
+            if cancel is not None and cancel.is_set():
+                from .export import ExportCancelled
+                raise ExportCancelled(path)
+            stop = min(n, start + chunk_rows)
+            for name, column in data.items():
+                datasets[name][start:stop] = column[start:stop]
+            if progress is not None:
+                progress(stop, n)
+        if peaks is not None:
+            for name, column in zip(_PEAK_COLUMNS, peaks):
+                h5f.create_dataset(name, data=np.asarray(column, dtype=np.int64), maxshape=(None,), chunks=True)
+        h5f.attrs["format"] = "mountsinai_ekg.recording"
+        h5f.attrs["channel_names"] = list(block.channel_names)
+        if encoded is not None:
+            h5f.attrs["value_scale"] = encoded[1]
+            if encoded[2] is not None:
+                h5f.attrs["value_decimals"] = encoded[2]
+        h5f.attrs["software_version"] = software_version()
+        h5f.attrs["saved_at"] = datetime.datetime.now().astimezone().isoformat()
+        for key, value in (metadata or {}).items():
+            if value is not None:
+                h5f.attrs[key] = value
+        h5f.attrs["rows"] = n
+        h5f.attrs["complete"] = True
+    return n
+
+
+def write_peaks(path: str, indices: Sequence[int], timestamps_ns: Sequence[int]) -> None:
+    """Add (or replace) the R peaks stored in an existing recording."""
+    with h5py.File(path, "a", libver="latest") as h5f:
+        for name, column in zip(_PEAK_COLUMNS, (indices, timestamps_ns)):
+            if name in h5f:
+                del h5f[name]
+            h5f.create_dataset(name, data=np.asarray(column, dtype=np.int64), maxshape=(None,), chunks=True)
+
+
+def read_metadata(path: str) -> Dict[str, Any]:
+    with h5py.File(path, "r", libver="latest", swmr=True) as h5f:
+        meta = {}
+        for key, value in h5f.attrs.items():
+            if isinstance(value, np.ndarray):
+                value = [v.decode() if isinstance(v, bytes) else v for v in value.tolist()]
+            elif isinstance(value, np.generic):
+                value = value.item()
+            meta[key] = value
+        return meta
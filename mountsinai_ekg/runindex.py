@@ -0,0 +1,93 @@
+"""Index of finished sync runs, so unchanged ECG/holo pairs are not redone.
+
+The index lives in the batch output folder as ``.sync_index.json``. It maps
+each run folder to a key hashed from the contents of both inputs and the
+options that shape the outputs, plus the result that run reported.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+
+def file_digest(path: str, chunk_bytes: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_bytes), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class RunIndex:
+    """Index of finished sync runs, kept as a small JSON file in the output folder.
+
+    A run is keyed by content hashes of its ECG and holo inputs plus the
+    options that shape its outputs (trim mode or manual window, formats,
+    plot, software version). Input hashes are remembered against each file's
+    size and mtime, so an unchanged file is hashed only once.
+    """
+
+    FILENAME = '.sync_index.json'
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, self.FILENAME)
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.files: Dict[str, Any] = {}
+        self.runs: Dict[str, Any] = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.files, self.runs = data['files'], data['runs']
+        except (OSError, ValueError, KeyError):
+            pass  # no index yet, or an unreadable one: every run counts as new
+
+    def digest(self, path: str) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = self.files.get(path)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            return known['sha1']
+        sha1 = file_digest(path)
+        self.files[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': sha1}
+        self._dirty = True
+        return sha1
+
+    def run_key(self, ecg_path: str, h5_path: str, options: Dict[str, Any]) -> str:
+        ident = [self.digest(ecg_path), self.digest(h5_path), sorted(options.items())]
+        return hashlib.sha1(json.dumps(ident, default=str).encode()).hexdigest()
+
+    def lookup(self, name: str, key: str) -> Optional[Dict[str, Any]]:
+        """The stored result for run ``name`` if its key matches and its files still exist."""
+        entry = self.runs.get(name)
+        result = entry['result'] if entry and entry['key'] == key else None
+        if result is not None:
+            outputs = [result.get(k) for k in ('csv', 'json', 'bundle', 'trim_info', 'arterial', 'plot')]
+            if not all(os.path.exists(p) for p in outputs if p):
+                result = None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def record(self, name: str, key: str, result: Dict[str, Any]) -> None:
+        self.runs[name] = {'key': key, 'result': result, 'recorded_at': time.time()}
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.part'
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'runs': self.runs}, f, default=str)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {'index': self.path, 'runs': len(self.runs), 'hits': self.hits, 'misses': self.misses}
@@ -3,12 +3,21 @@ from __future__ import annotations
 
 import threading
 import time
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Sequence, Set
 
+import numpy as np
 import pyfirmata2
 
-_ecg_scan_stop_flag = threading.Event()
+from .buffer import SampleBlock, SampleBuffer, value_field_names
+from .clock import SampleClock
+from .stats import ScanStats
 
+if TYPE_CHECKING:
+    # optional pipeline stages; only needed for annotations, and scipy/h5py are slow to import
+    from .dsp import FilterPipeline
+    from .pyramid import MinMaxPyramid
+    from .qrs import QRSDetector
+    from .recorder import StreamRecorder
 
 def _parse_analog_index(analog_pin: str) -> int:
     s = analog_pin.strip().lower()
@@ -28,68 +37,399 @@ def _parse_analog_index(analog_pin: str) -> int:
     return int(s)
 
 
+# sampling is configured per board, so keep it on while any session still uses the board
+_board_users: Dict[int, int] = {}
+# sampling interval (ms) the board was started with; later sessions on the board run at this rate
+_board_intervals: Dict[int, int] = {}
+_board_users_lock = threading.Lock()
+# sessions started through the legacy start_ecg_scan/stop_ecg_scan functions
+_legacy_sessions: Set["EcgScanSession"] = set()
+_legacy_sessions_lock = threading.Lock()
+
+
+class EcgScanSession:
+    """One acquisition with its own stop event, buffer and stats.
+
+    Sessions are independent: several can run at once on different boards or
+    pins, and stopping one leaves the others running. ``start()`` runs the scan
+    on a background thread, ``run()`` blocks the calling thread instead.
+
+    Passing ``analog_pins`` captures several inputs into one buffer, one row per
+    Firmata sampling tick with a shared timestamp.
+
+    With ``clock="model"`` (the default) rows are stamped in batches by a
+    :class:`SampleClock` fitted against the sample counter; ``clock="wall"``
+    keeps the per-callback ``time.time_ns()`` stamps.
+
+    An optional :class:`FilterPipeline` runs block by block in the scan loop;
+    its output lands in the buffer's ``filtered`` column next to the raw values.
+    An optional :class:`QRSDetector` sees every block too; its R peaks are
+    written to the recorder alongside the samples. An optional
+    :class:`MinMaxPyramid` is extended with the raw values of every block, so a
+    full-session overview is ready as soon as the scan stops.
+    """
+
+    def __init__(
+        self,
+        board: "pyfirmata2.Arduino",
+        analog_pin: str = "a:0:i",
+        target_hz: int = 200,
+        data_callback=None,
+        analog_input: Optional[Any] = None,
+        buffer: Optional[SampleBuffer] = None,
+        recorder: Optional[StreamRecorder] = None,
+        batch_callback: Optional[Callable[[SampleBlock], Any]] = None,
+        batch_size: int = 0,
+        batch_interval_s: float = 0.05,
+        analog_pins: Optional[Sequence[str]] = None,
+        analog_inputs: Optional[Sequence[Any]] = None,
+        clock: str = "model",
+        filters: Optional[FilterPipeline] = None,
+        qrs: Optional[QRSDetector] = None,
+        pyramid: Optional[MinMaxPyramid] = None,
+    ):
+        if clock not in ("model", "wall"):
+            raise ValueError(f"Unknown clock mode {clock!r}; expected 'model' or 'wall'")
+        self.board = board
+        self.analog_pin = analog_pin
+        self.target_hz = target_hz
+        self.data_callback = data_callback
+        self.analog_input = analog_input
+        if analog_inputs is not None:
+            self.analog_inputs = list(analog_inputs)
+        elif analog_input is not None:
+            self.analog_inputs = [analog_input]
+        else:
+            self.analog_inputs = None
+        if self.analog_inputs is not None:
+            self.analog_pins = [f"a:{getattr(p, 'pin_number', i)}:i" for i, p in enumerate(self.analog_inputs)]
+        else:
+            self.analog_pins = list(analog_pins or [analog_pin])
+        self.channel_names = [f"A{_parse_analog_index(p)}" for p in self.analog_pins]
+        if buffer is None:
+            buffer = SampleBuffer(channel_names=self.channel_names, filtered=filters is not None)
+        elif buffer.n_channels != len(self.channel_names):
+            raise ValueError(
+                f"Buffer has {buffer.n_channels} channel(s) but {len(self.channel_names)} pin(s) were given"
+            )
+        elif filters is not None and not buffer.filtered:
+            raise ValueError("A filter pipeline needs a buffer created with filtered=True")
+        self.buffer = buffer
+        self.filters = filters
+        self.qrs = qrs
+        self.pyramid = pyramid
+        self.clock_mode = clock
+        self.clock: Optional[SampleClock] = None
+        self.recorder = recorder
+        self.batch_callback = batch_callback
+        self.batch_size = batch_size
+        self.batch_interval_s = batch_interval_s
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.scan_stats = ScanStats(target_hz)
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        stats = self.scan_stats.snapshot()
+        qrs = self.qrs
+        if qrs is not None:
+            stats["beats"] = len(qrs.peaks)
+            stats["heart_rate_bpm"] = qrs.bpm
+            stats["rr_ms"] = qrs.rr_ms
+        clock = self.clock
+        if clock is not None:
+            stats["clock_interval_ns"] = clock.interval_ns
+            stats["clock_drift_ppm"] = clock.drift_ppm
+            stats["clock_jitter_ns"] = clock.jitter_ns
+            stats["clock_steps"] = len(clock.steps)
+            stats["clock_max_step_ms"] = max((abs(step) for _, step in clock.steps), default=0) / 1_000_000
+        return stats
+
+    def start(self) -> "EcgScanSession":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name=f"ecg-scan-{'+'.join(self.channel_names)}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def __enter__(self) -> "EcgScanSession":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+        self.join()
+
+    def run(self) -> SampleBuffer:
+        board = self.board
+        ECG_data = self.buffer
+        recorder = self.recorder
+        batch_callback = self.batch_callback
+        batch_size = self.batch_size
+        batch_interval_s = self.batch_interval_s
+        data_callback = self.data_callback
+        filters = self.filters
+        qrs = self.qrs
+        pyramid = self.pyramid
+
+        sampling_interval_ms = max(1, int(1000 / max(1, int(self.target_hz))))
+        scan_stats = self.scan_stats
+        latency_every = scan_stats.latency_every
+
+        if self.analog_inputs is not None:
+            a_pins = self.analog_inputs
+        else:
+            a_pins = [board.analog[_parse_analog_index(p)] for p in self.analog_pins]
+        n_channels = len(a_pins)
+        value_fields = value_field_names(ECG_data.channel_names)
+        with _board_users_lock:
+            users = _board_users.get(id(board), 0)
+            if users:
+                # samplingOn does nothing while the board is sampling, so this session gets the running rate
+                active_ms = _board_intervals.get(id(board), sampling_interval_ms)
+                if active_ms != sampling_interval_ms:
+                    print(
+                        f"Board is already sampling every {active_ms} ms for another session; "
+                        f"using that instead of {sampling_interval_ms} ms"
+                    )
+                    sampling_interval_ms = active_ms
+                    self.target_hz = 1000 / active_ms
+                    scan_stats.set_target_hz(self.target_hz)
+            else:
+                board.samplingOn(sampling_interval_ms)
+                _board_intervals[id(board)] = sampling_interval_ms
+            _board_users[id(board)] = users + 1
+
+        clock = None
+        if self.clock_mode == "model":
+            clock = SampleClock(sampling_interval_ms * 1_000_000)
+        self.clock = clock
+
+        sample_counter = 0
+
+        def _on_sample(value):
+            nonlocal sample_counter
+            sample_counter += 1
+            # time only every Nth callback so the measurement itself stays cheap
+            timed = sample_counter % latency_every == 0
+            if timed:
+                t_enter = time.perf_counter_ns()
+            if clock is None:
+                ts_ns = time.time_ns()
+                ECG_data.append(sample_counter, value, ts_ns)
+            else:
+                # stamped later in _pump, in batches, from the clock model
+                ECG_data.append(sample_counter, value, 0)
+            if data_callback:
+                if clock is not None:
+                    ts_ns = clock.predict(sample_counter - 1)
+                try:
+                    row = {"sample_num": sample_counter}
+                    if n_channels == 1:
+                        row["analog_value"] = value
+                    else:
+                        row.update(zip(value_fields, value.tolist()))
+                    row["timestamp_ns"] = ts_ns
+                    row["timestamp_seconds"] = ts_ns / 1_000_000_000
+                    data_callback(row)
+                except Exception as _:
+                    pass
+            if timed:
+                scan_stats.record_latency(time.perf_counter_ns() - t_enter)
+
+        # Firmata reports every enabled pin once per sampling tick, so a row is
+        # complete once each channel has reported. A channel reporting twice
+        # before that means a message was lost; the row is committed with the
+        # missing channels carried forward from the previous tick.
+        row_values = np.zeros(n_channels, dtype=np.float64)
+        row_seen = [False] * n_channels
+        row_filled = 0
+
+        def _commit_row():
+            nonlocal row_filled
+            _on_sample(row_values.copy())
+            for i in range(n_channels):
+                row_seen[i] = False
+            row_filled = 0
+
+        def _make_channel_callback(index: int):
+            def _on_channel(value: float):
+                nonlocal row_filled
+                if row_seen[index]:
+                    _commit_row()
+                row_values[index] = value
+                row_seen[index] = True
+                row_filled += 1
+                if row_filled == n_channels:
+                    _commit_row()
+            return _on_channel
+
+        delivered = 0
+        batched = 0
+        steps_recorded = 0
+        last_batch = time.monotonic()
+
+        def _pump(final: bool = False):
+            # hand rows committed since the last pass to the recorder's writer thread
+            # and, once a batch fills up by count or time window, to batch_callback
+            nonlocal delivered, batched, last_batch, steps_recorded
+            available = len(ECG_data)
+            if available > delivered:
+                arrived_ns = time.time_ns()
+                scan_stats.observe_arrival(available - delivered, arrived_ns)
+                if clock is not None:
+                    clock.observe(available, arrived_ns)
+                    ECG_data.set_timestamps(delivered, clock.timestamps(delivered, available))
+                    if len(clock.steps) > steps_recorded:
+                        new_steps = clock.steps[steps_recorded:]
+                        steps_recorded = len(clock.steps)
+                        if recorder is not None:
+                            recorder.submit_clock_steps([i for i, _ in new_steps], [step for _, step in new_steps])
+                if filters is not None:
+                    raw = ECG_data.view(delivered, available).values
+                    ECG_data.set_filtered(delivered, filters.process(raw))
+                block = ECG_data.view(delivered, available)
+                if pyramid is not None:
+                    pyramid.extend(block.values)
+                if recorder is not None:
+                    recorder.submit(block)
+                if qrs is not None:
+                    peaks = qrs.process(block)
+                    if peaks and recorder is not None:
+                        recorder.submit_peaks([p.index for p in peaks], [p.timestamp_ns for p in peaks])
+            scan_stats.observe_poll(available, available - ECG_data.first_index, ECG_data.retain)
+            delivered = available
+
+            if batch_callback is None or available <= batched:
+                return
+            now = time.monotonic()
+            full = batch_size > 0 and available - batched >= batch_size
+            if final or full or now - last_batch >= batch_interval_s:
+                try:
+                    batch_callback(ECG_data.view(batched, available))
+                except Exception:
+                    pass
+                batched = available
+                last_batch = now
+
+        if recorder is not None:
+            recorder.open(
+                channel_names=ECG_data.channel_names,
+                filtered=ECG_data.filtered,
+                peaks=qrs is not None,
+                clock_steps=clock is not None,
+            )
+
+        self._running = True
+        scan_stats.start()
+        if n_channels == 1:
+            a_pins[0].register_callback(_on_sample)
+        else:
+            for i, a_pin in enumerate(a_pins):
+                a_pin.register_callback(_make_channel_callback(i))
+        for a_pin in a_pins:
+            a_pin.enable_reporting()
+
+        try:
+            while not self._stop_event.is_set():
+                time.sleep(0.01) 
+                _pump()
+        finally:
+
+            for a_pin in a_pins:
+                try:
+                    a_pin.disable_reporting()
+                except Exception:
+                    pass
+                try:
+                    a_pin.register_callback(None)
+                except Exception:
+                    pass
+            with _board_users_lock:
+                remaining = _board_users.get(id(board), 1) - 1
+                if remaining > 0:
+                    _board_users[id(board)] = remaining
+                else:
+                    _board_users.pop(id(board), None)
+                    _board_intervals.pop(id(board), None)
+                    try:
+                        board.samplingOff()
+                    except Exception:
+                        pass
+            _pump(final=True)
+            if recorder is not None:
+                recorder.close()
+            scan_stats.stop()
+            self._running = False
+
+        return ECG_data
+
+
 def start_ecg_scan(
     board: "pyfirmata2.Arduino",
     analog_pin: str = "a:0:i",
     target_hz: int = 200,
     data_callback=None,
     analog_input: Optional[Any] = None,
-):
-
-    ECG_data: list[Dict[str, Any]] = []
-    _ecg_scan_stop_flag.clear()
-
-    sampling_interval_ms = max(1, int(1000 / max(1, int(target_hz))))
-
-    if analog_input is not None:
-        a_pin = analog_input
-    else:
-        idx = _parse_analog_index(analog_pin)
-        a_pin = board.analog[idx]
-    board.samplingOn(sampling_interval_ms)
-
-    sample_counter = 0
-
-    def _on_sample(value: float):
-        nonlocal sample_counter
-        sample_counter += 1
-        ts_ns = time.time_ns()
-        sample = {
-            "sample_num": sample_counter,
-            "analog_value": value,  
-            "timestamp_ns": ts_ns,
-            "timestamp_seconds": ts_ns / 1_000_000_000,
-        }
-        ECG_data.append(sample)
-        if data_callback:
-            try:
-                data_callback(sample)
-            except Exception as _:
-                pass
-
-    a_pin.register_callback(_on_sample)
-    a_pin.enable_reporting()
+    buffer: Optional[SampleBuffer] = None,
+    recorder: Optional[StreamRecorder] = None,
+    batch_callback: Optional[Callable[[SampleBlock], Any]] = None,
+    batch_size: int = 0,
+    batch_interval_s: float = 0.05,
+    analog_pins: Optional[Sequence[str]] = None,
+    clock: str = "model",
+    filters: Optional[FilterPipeline] = None,
+    qrs: Optional[QRSDetector] = None,
+    pyramid: Optional[MinMaxPyramid] = None,
+) -> SampleBuffer:
 
+    session = EcgScanSession(
+        board,
+        analog_pin=analog_pin,
+        target_hz=target_hz,
+        data_callback=data_callback,
+        analog_input=analog_input,
+        buffer=buffer,
+        recorder=recorder,
+        batch_callback=batch_callback,
+        batch_size=batch_size,
+        batch_interval_s=batch_interval_s,
+        analog_pins=analog_pins,
+        clock=clock,
+        filters=filters,
+        qrs=qrs,
+        pyramid=pyramid,
+    )
+    with _legacy_sessions_lock:
+        _legacy_sessions.add(session)
     try:
-        while not _ecg_scan_stop_flag.is_set():
-            time.sleep(0.01) 
+        return session.run()
     finally:
-
-        try:
-            a_pin.disable_reporting()
-        except Exception:
-            pass
-        try:
-            board.samplingOff()
-        except Exception:
-            pass
-
-    return ECG_data
+        with _legacy_sessions_lock:
+            _legacy_sessions.discard(session)
 
 
 def stop_ecg_scan():
 
-    _ecg_scan_stop_flag.set()
+    with _legacy_sessions_lock:
+        sessions = list(_legacy_sessions)
+    for session in sessions:
+        session.stop()
 
 
 def connect_to_arduino(port: str | None = None):
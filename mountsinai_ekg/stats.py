@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+# callback latency buckets are powers of two in ns: bucket k holds durations in [2**(k-1), 2**k)
+_LATENCY_BUCKETS = 32
+
+
+class ScanStats:
+    """Live health counters for one acquisition.
+
+    The scan loop reports each poll and the wall time at which new rows
+    arrived; the sample callback reports its own execution time for every
+    ``latency_every``-th sample. :meth:`snapshot` can be read from any thread.
+
+    Gaps are found from arrivals, not from row timestamps: a model clock
+    spreads rows evenly and would hide lost data. Between two polls that
+    delivered rows, time the new rows do not account for (beyond
+    ``gap_slack_ns`` of poll and serial jitter) counts as a gap.
+    """
+
+    def __init__(
+        self,
+        target_hz: float,
+        latency_every: int = 16,
+        rate_window_s: float = 2.0,
+        gap_slack_ns: int = 20_000_000,
+    ):
+        self.target_hz = float(target_hz)
+        self.expected_interval_ns = 1_000_000_000 / max(self.target_hz, 1e-9)
+        self.latency_every = max(1, int(latency_every))
+        self.rate_window_s = float(rate_window_s)
+        self.gap_slack_ns = int(gap_slack_ns)
+        self.latency_counts = [0] * (_LATENCY_BUCKETS + 1)
+        self.latency_max_ns = 0
+        self.samples = 0
+        self.gaps = 0
+        self.dropped_estimate = 0
+        self.max_gap_ns = 0
+        self.stalls = 0
+        self.buffer_rows = 0
+        self.buffer_capacity: Optional[int] = None
+        self.started_ns: Optional[int] = None
+        self.stopped_ns: Optional[int] = None
+        self._last_arrival_ns: Optional[int] = None
+        self._last_growth_ns: Optional[int] = None
+        self._in_stall = False
+        self._polls: "deque[tuple]" = deque()
+        self._lock = threading.Lock()
+
+    def set_target_hz(self, target_hz: float) -> None:
+        self.target_hz = float(target_hz)
+        self.expected_interval_ns = 1_000_000_000 / max(self.target_hz, 1e-9)
+
+    def start(self) -> None:
+        self.started_ns = time.time_ns()
+        self.stopped_ns = None
+        self._last_growth_ns = time.monotonic_ns()
+
+    def stop(self) -> None:
+        self.stopped_ns = time.time_ns()
+
+    def record_latency(self, duration_ns: int) -> None:
+        self.latency_counts[min(int(duration_ns).bit_length(), _LATENCY_BUCKETS)] += 1
+        if duration_ns > self.latency_max_ns:
+            self.latency_max_ns = duration_ns
+
+    def observe_poll(self, count: int, buffer_rows: int, buffer_capacity: Optional[int]) -> None:
+        now = time.monotonic_ns()
+        self.buffer_rows = buffer_rows
+        self.buffer_capacity = buffer_capacity
+        with self._lock:
+            if count > self.samples or self._last_growth_ns is None:
+                self._last_growth_ns = now
+                self._in_stall = False
+            elif not self._in_stall and now - self._last_growth_ns > 5 * self.expected_interval_ns + 20_000_000:
+                # nothing arrived for several sampling intervals beyond the poll period
+                self.stalls += 1
+                self._in_stall = True
+            self.samples = count
+            self._polls.append((now, count))
+            horizon = now - int(self.rate_window_s * 1_000_000_000)
+            while len(self._polls) > 2 and self._polls[0][0] < horizon:
+                self._polls.popleft()
+
+    def observe_arrival(self, rows: int, t_ns: int) -> None:
+        if rows <= 0:
+            return
+        last = self._last_arrival_ns
+        self._last_arrival_ns = t_ns
+        if last is None:
+            return
+        elapsed = t_ns - last
+        uncovered = elapsed - rows * self.expected_interval_ns
+        if uncovered > 2 * self.expected_interval_ns + self.gap_slack_ns:
+            self.gaps += 1
+            self.dropped_estimate += int(round(uncovered / self.expected_interval_ns))
+            self.max_gap_ns = max(self.max_gap_ns, elapsed)
+
+    def latency_percentile_ns(self, q: float) -> int:
+        """Upper bound of the histogram bucket holding the ``q``-th percentile, capped at the largest latency seen."""
+        counts = list(self.latency_counts)
+        total = sum(counts)
+        if total == 0:
+            return 0
+        target = q / 100.0 * total
+        running = 0
+        for k, c in enumerate(counts):
+            running += c
+            if running >= target:
+                return min(1 << k, self.latency_max_ns)
+        return self.latency_max_ns
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed_s = 0.0
+        if self.started_ns is not None:
+            end_ns = self.stopped_ns if self.stopped_ns is not None else time.time_ns()
+            elapsed_s = (end_ns - self.started_ns) / 1_000_000_000
+        with self._lock:
+            polls = list(self._polls)
+        recent_hz = 0.0
+        if len(polls) >= 2 and polls[-1][0] > polls[0][0]:
+            recent_hz = (polls[-1][1] - polls[0][1]) / ((polls[-1][0] - polls[0][0]) / 1_000_000_000)
+        effective_hz = self.samples / elapsed_s if elapsed_s > 0 else 0.0
+        expected = int(round(elapsed_s * self.target_hz))
+        fill = None
+        if self.buffer_capacity:
+            fill = min(1.0, self.buffer_rows / self.buffer_capacity)
+        return {
+            "samples": self.samples,
+            "elapsed_s": elapsed_s,
+            "target_hz": self.target_hz,
+            "effective_hz": effective_hz,
+            "recent_hz": recent_hz,
+            "rate_ratio": effective_hz / self.target_hz if self.target_hz else 0.0,
+            "missing_samples": max(0, expected - self.samples),
+            "gaps": self.gaps,
+            "dropped_estimate": self.dropped_estimate,
+            "max_gap_ms": self.max_gap_ns / 1_000_000,
+            "stalls": self.stalls,
+            "callback_latency_p50_us": self.latency_percentile_ns(50) / 1000,
+            "callback_latency_p99_us": self.latency_percentile_ns(99) / 1000,
+            "callback_latency_max_us": self.latency_max_ns / 1000,
+            "callback_latency_histogram": {
+                f"<{(1 << k) / 1000:g}us": c for k, c in enumerate(self.latency_counts) if c
+            },
+            "buffer_rows": self.buffer_rows,
+            "buffer_capacity": self.buffer_capacity,
+            "buffer_fill": fill,
+        }
+
+    def summary(self) -> str:
+        s = self.snapshot()
+        text = (
+            f"{s['recent_hz']:.0f}/{s['target_hz']:.0f} Hz | gaps {s['gaps']} "
+            f"(~{max(s['dropped_estimate'], s['missing_samples'])} missed) | "
+            f"cb p99 {s['callback_latency_p99_us']:.0f} us"
+        )
+        if s["buffer_fill"] is not None:
+            text += f" | buffer {s['buffer_fill'] * 100:.0f}%"
+        return text
+
+    def dump_json(self, path: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        payload = self.snapshot()
+        if extra:
+            payload.update(extra)
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
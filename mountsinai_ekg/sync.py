@@ -4,15 +4,23 @@ from __future__ import annotations
 
 import csv
 import datetime
+import itertools
 import json
 import os
+import time
+import warnings
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
-import h5py
-import matplotlib.pyplot as plt
 import numpy as np
 
+from .cache import ParsedECGCache
+from .export import write_json_columns
+from .holo import VELOCITY_DATASET, HoloSource
+
+# h5py and matplotlib are imported where they are used, so importing this
+# module (and opening the sync window) does not wait for them
+
 
 @dataclass
 class ECGSample:
@@ -22,34 +30,264 @@ class ECGSample:
     timestamp_seconds: float
 
 
+def _ns_to_seconds(ns: np.ndarray) -> np.ndarray:
+    # split off whole seconds so the result matches Python's exact int / int division
+    ns = np.asarray(ns, dtype=np.int64)
+    return (ns // 1_000_000_000).astype(np.float64) + (ns % 1_000_000_000) / 1e9
+
+
+# header aliases accepted for each ECG column, in order of preference
+ECG_CSV_ALIASES = {
+    'sample_num': ('sample_num', 'Sample#'),
+    'analog_value': ('analog_value', 'analog', 'Analog'),
+    'timestamp_ns': ('timestamp_ns', 'Timestamp_ns'),
+    'timestamp_seconds': ('timestamp_seconds', 'Timestamp_seconds'),
+}
+_ECG_CSV_DTYPES = {'sample_num': np.int64, 'analog_value': np.float64, 'timestamp_ns': np.int64, 'timestamp_seconds': np.float64}
+
+
+def _parse_ecg_rows_slow(lines, cols, first_line, bad_lines):
+    # per-row fallback for a chunk the bulk parser rejected; bad rows are dropped and reported
+    out = {name: [] for name in cols}
+    for offset, row in enumerate(csv.reader(lines)):
+        if not row:
+            continue
+        try:
+            parsed = {}
+            for name, col in cols.items():
+                text = row[col].strip()
+                if name == 'timestamp_ns':
+                    try:
+                        parsed[name] = int(text)
+                    except ValueError:
+                        if 'timestamp_seconds' not in cols:
+                            raise
+                        parsed[name] = int(float(row[cols['timestamp_seconds']]) * 1_000_000_000)
+                else:
+                    parsed[name] = _ECG_CSV_DTYPES[name](float(text) if name == 'sample_num' else text)
+        except (ValueError, IndexError):
+            bad_lines.append(first_line + offset)
+            continue
+        for name, value in parsed.items():
+            out[name].append(value)
+    return {name: np.array(values, dtype=_ECG_CSV_DTYPES[name]) for name, values in out.items()}
+
+
+# bump when read_ecg_csv changes what it produces, so cached parses are redone
+ECG_LOADER_VERSION = 1
+
+
+def read_ecg_csv(path: str, chunk_rows: int = 500_000, timestamp_ns_field: str = 'timestamp_ns'):
+    """Parse an ECG CSV into an :class:`ECGTrace` plus a load report.
+
+    Header aliases are resolved once; the rows are then parsed a chunk at a
+    time with ``np.loadtxt`` straight into typed columns. A chunk the bulk
+    parser rejects is re-parsed row by row, and rows that still fail are
+    dropped and counted in the report instead of being read as zeros.
+    """
+    started = time.perf_counter()
+    with open(path, 'r', newline='') as f:
+        header = next(csv.reader([f.readline()]), [])
+        index = {name.strip(): i for i, name in enumerate(header)}
+        aliases = dict(ECG_CSV_ALIASES)
+        aliases['timestamp_ns'] = (timestamp_ns_field,) + tuple(a for a in aliases['timestamp_ns'] if a != timestamp_ns_field)
+        cols = {}
+        for name, names in aliases.items():
+            found = next((index[a] for a in names if a in index), None)
+            if found is not None:
+                cols[name] = found
+        if 'timestamp_ns' not in cols and 'timestamp_seconds' not in cols:
+            raise ValueError(f"{path}: no timestamp_ns or timestamp_seconds column in header {header}")
+        if 'analog_value' not in cols:
+            raise ValueError(f"{path}: no analog_value column in header {header}")
+        names = list(cols)
+        dtype = np.dtype([(name, _ECG_CSV_DTYPES[name]) for name in names])
+        usecols = [cols[name] for name in names]
+
+        parts = []
+        bad_lines: List[int] = []
+        line_no = 2
+        body_start = f.tell()
+        try:
+            # clean files parse in one pass straight from the file
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='loadtxt: input contained no data')
+                data = np.loadtxt(f, delimiter=',', usecols=usecols, dtype=dtype, ndmin=1, quotechar='"')
+            parts.append({name: data[name] for name in names})
+            chunked = False
+        except ValueError:
+            f.seek(body_start)
+            chunked = True
+        while chunked:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                break
+            try:
+                data = np.loadtxt(lines, delimiter=',', usecols=usecols, dtype=dtype, ndmin=1, quotechar='"')
+                parts.append({name: data[name] for name in names})
+            except ValueError:
+                parts.append(_parse_ecg_rows_slow(lines, cols, line_no, bad_lines))
+            line_no += len(lines)
+
+    def column(name):
+        return np.concatenate([p[name] for p in parts]) if parts else np.empty(0, dtype=_ECG_CSV_DTYPES[name])
+
+    seconds = column('timestamp_seconds') if 'timestamp_seconds' in cols else None
+    if 'timestamp_ns' in cols:
+        ns = column('timestamp_ns')
+    else:
+        ns = (seconds * 1_000_000_000).astype(np.int64)
+    nums = column('sample_num') if 'sample_num' in cols else np.zeros(len(ns), dtype=np.int64)
+    trace = ECGTrace(nums, column('analog_value'), ns, seconds)
+    ordered = trace.sorted_by_time()
+    was_sorted = ordered is trace
+    report = {
+        'path': path,
+        'rows': len(trace),
+        'malformed_rows': len(bad_lines),
+        'malformed_lines': bad_lines[:20],
+        'columns': {name: header[i] for name, i in cols.items()},
+        'already_sorted': was_sorted,
+        'seconds': time.perf_counter() - started,
+    }
+    return ordered, report
+
+
+class ECGTrace:
+    """Columnar ECG samples: one NumPy array per ECGSample field.
+
+    Behaves like a read-only sequence of :class:`ECGSample`: indexing with an
+    int builds the sample on demand, slicing returns another ``ECGTrace``
+    sharing the same arrays (no copy), so trims stay cheap whatever their size.
+    """
+
+    __slots__ = ('sample_num', 'analog_value', 'timestamp_ns', 'timestamp_seconds')
+
+    def __init__(self, sample_num, analog_value, timestamp_ns, timestamp_seconds=None) -> None:
+        self.sample_num = np.asarray(sample_num, dtype=np.int64)
+        self.analog_value = np.asarray(analog_value, dtype=np.float64)
+        self.timestamp_ns = np.asarray(timestamp_ns, dtype=np.int64)
+        if timestamp_seconds is None:
+            timestamp_seconds = _ns_to_seconds(self.timestamp_ns)
+        self.timestamp_seconds = np.asarray(timestamp_seconds, dtype=np.float64)
+
+    @classmethod
+    def empty(cls) -> 'ECGTrace':
+        return cls(np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64), np.empty(0))
+
+    @classmethod
+    def from_samples(cls, samples) -> 'ECGTrace':
+        samples = list(samples)
+        return cls(
+            [s.sample_num for s in samples],
+            [s.analog_value for s in samples],
+            [s.timestamp_ns for s in samples],
+            [s.timestamp_seconds for s in samples],
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamp_ns)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ECGTrace(
+                self.sample_num[key], self.analog_value[key], self.timestamp_ns[key], self.timestamp_seconds[key]
+            )
+        i = int(key)
+        return ECGSample(
+            sample_num=int(self.sample_num[i]),
+            analog_value=float(self.analog_value[i]),
+            timestamp_ns=int(self.timestamp_ns[i]),
+            timestamp_seconds=float(self.timestamp_seconds[i]),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f'ECGTrace({len(self)} samples)'
+
+    def sorted_by_time(self) -> 'ECGTrace':
+        ts = self.timestamp_ns
+        if len(ts) < 2 or bool(np.all(ts[1:] >= ts[:-1])):
+            return self
+        order = np.argsort(ts, kind='stable')
+        return ECGTrace(self.sample_num[order], self.analog_value[order], ts[order], self.timestamp_seconds[order])
+
+    def to_samples(self) -> List[ECGSample]:
+        return list(self)
+
+
 class EKGSync:
-    def __init__(self) -> None:
+    def __init__(self, ecg_cache: Optional[ParsedECGCache] = None) -> None:
+        # parsed CSVs are kept here between runs when a cache is given
+        self.ecg_cache = ecg_cache
         self.h5_path: Optional[str] = None
         self.holo_unix_first: Optional[float] = None
         self.holo_unix_last: Optional[float] = None
-        self.arterial_velocity: Optional[np.ndarray] = None
+        self.holo: Optional[HoloSource] = None
+        self._arterial_velocity: Optional[np.ndarray] = None
+        self._velocity_loaded = False
 
-        self.ecg_samples: List[ECGSample] = []
+        self.ecg: ECGTrace = ECGTrace.empty()
+        self.ecg_load_report: Optional[Dict[str, Any]] = None
+
+    @property
+    def ecg_samples(self) -> ECGTrace:
+        # kept for callers of the old List[ECGSample] attribute; indexing builds samples on demand
+        return self.ecg
+
+    @ecg_samples.setter
+    def ecg_samples(self, samples) -> None:
+        trace = samples if isinstance(samples, ECGTrace) else ECGTrace.from_samples(samples)
+        self.ecg = trace.sorted_by_time()
 
     def load_h5(self, path: str) -> None:
+        """Open a holo file, reading only its timestamps.
+
+        The velocity signal is read the first time :attr:`arterial_velocity`
+        is used. The file stays open until the next ``load_h5`` or
+        :meth:`close`.
+        """
         if not os.path.exists(path):
             raise FileNotFoundError(path)
 
-        with h5py.File(path, 'r') as h5f:
-            try:
-                unix_first_arr = h5f['/UnixTimestampFirst'][:]
-                unix_last_arr = h5f['/UnixTimestampLast'][:]
-                self.holo_unix_first = float(unix_first_arr[0]) if len(unix_first_arr) > 0 else float(unix_first_arr)
-                self.holo_unix_last = float(unix_last_arr[0]) if len(unix_last_arr) > 0 else float(unix_last_arr)
-            except Exception as e:
-                raise RuntimeError(f"Failed to read UnixTimestampFirst/Last: {e}")
+        source = HoloSource(path)
+        self.close()
+        self.holo = source
+        self.holo_unix_first = source.unix_first
+        self.holo_unix_last = source.unix_last
+        self.h5_path = path
 
+    @property
+    def arterial_velocity(self) -> Optional[np.ndarray]:
+        if not self._velocity_loaded and self.holo is not None and not self.holo.closed:
             try:
-                self.arterial_velocity = np.array(h5f['/SignalsArterialVelocity_y'][:])
+                self._arterial_velocity = self.holo.read(VELOCITY_DATASET)
             except Exception:
-                self.arterial_velocity = None
+                self._arterial_velocity = None
+            self._velocity_loaded = True
+        return self._arterial_velocity
 
-        self.h5_path = path
+    @arterial_velocity.setter
+    def arterial_velocity(self, values: Optional[np.ndarray]) -> None:
+        self._arterial_velocity = values
+        self._velocity_loaded = True
+
+    def close(self) -> None:
+        """Release the holo file and the cached velocity."""
+        if self.holo is not None:
+            self.holo.close()
+        self.holo = None
+        self._arterial_velocity = None
+        self._velocity_loaded = False
+
+    def __enter__(self) -> 'EKGSync':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     @staticmethod
     def _parse_time_to_seconds(txt):
@@ -64,13 +302,13 @@ class EKGSync:
         relative_to_ecg_start: bool = True
     ):
 
-        if not self.ecg_samples:
+        if not len(self.ecg):
             raise RuntimeError("ECG samples not loaded")
 
         if start_time_s > end_time_s:
             start_time_s, end_time_s = end_time_s, start_time_s
 
-        t0 = self.ecg_samples[0].timestamp_seconds
+        t0 = float(self.ecg.timestamp_seconds[0])
         if relative_to_ecg_start:
             start_abs_s = t0 + start_time_s
             end_abs_s   = t0 + end_time_s
@@ -88,7 +326,7 @@ class EKGSync:
         if s_idx > e_idx:
             s_idx, e_idx = e_idx, s_idx
 
-        trimmed = self.ecg_samples[s_idx:e_idx + 1]
+        trimmed = self.ecg[s_idx:e_idx + 1]
 
         info = {
             "mode": "manual_seconds",
@@ -99,8 +337,8 @@ class EKGSync:
             "resolved_end_abs_s": end_abs_s,
             "start_idx": s_idx,
             "end_idx": e_idx,
-            "start_sample": trimmed[0] if trimmed else None,
-            "end_sample": trimmed[-1] if trimmed else None,
+            "start_sample": trimmed[0] if len(trimmed) else None,
+            "end_sample": trimmed[-1] if len(trimmed) else None,
         }
         return trimmed, info
 
@@ -109,38 +347,51 @@ class EKGSync:
         if not os.path.exists(path):
             raise FileNotFoundError(path)
 
-        samples: List[ECGSample] = []
-        with open(path, 'r', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    sample_num = int(row.get('sample_num') or row.get('Sample#') or 0)
-                except Exception:
-                    sample_num = 0
-                try:
-                    analog_value = float(row.get('analog_value') or row.get('analog') or row.get('Analog') or 0.0)
-                except Exception:
-                    analog_value = 0.0
-                try:
-                    timestamp_ns = int(row.get('timestamp_ns') or row.get('Timestamp_ns') or 0)
-                except Exception:
-                    ts_seconds = float(row.get('timestamp_seconds') or row.get('Timestamp_seconds') or 0.0)
-                    timestamp_ns = int(ts_seconds * 1_000_000_000)
-                try:
-                    timestamp_seconds = float(row.get('timestamp_seconds') or row.get('Timestamp_seconds') or (timestamp_ns / 1_000_000_000))
-                except Exception:
-                    timestamp_seconds = timestamp_ns / 1_000_000_000
-
-                samples.append(ECGSample(sample_num=sample_num, analog_value=analog_value, timestamp_ns=timestamp_ns, timestamp_seconds=timestamp_seconds))
-
-        samples.sort(key=lambda s: s.timestamp_ns)
-        self.ecg_samples = samples
+        cached = None
+        if self.ecg_cache is not None:
+            cached = self.ecg_cache.load(path, ECG_LOADER_VERSION, timestamp_ns_field=timestamp_ns_field)
+        if cached is not None:
+            columns, meta = cached
+            self.ecg = ECGTrace(**columns)
+            self.ecg_load_report = dict(meta['report'], cached=True)
+        else:
+            self.ecg, self.ecg_load_report = read_ecg_csv(path, timestamp_ns_field=timestamp_ns_field)
+            if self.ecg_cache is not None:
+                columns = {name: getattr(self.ecg, name) for name in ECGTrace.__slots__}
+                self.ecg_cache.store(
+                    path, ECG_LOADER_VERSION, columns, {'report': self.ecg_load_report},
+                    timestamp_ns_field=timestamp_ns_field,
+                )
+        report = self.ecg_load_report
+        if report['malformed_rows']:
+            print(
+                f"{os.path.basename(path)}: skipped {report['malformed_rows']} malformed row(s) "
+                f"(lines {', '.join(map(str, report['malformed_lines']))}{', ...' if report['malformed_rows'] > 20 else ''})"
+            )
+
+    def load_ecg(self, path: str) -> None:
+        # binary recordings (.h5/.hdf5 from the capture app) load straight from their columns
+        if os.path.splitext(path)[1].lower() in ('.h5', '.hdf5'):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            from .recorder import read_recording
+            self.load_ecg_block(read_recording(path, value_dtype=np.float64))
+        else:
+            self.load_ecg_csv(path)
+
+    def load_ecg_buffer(self, buffer) -> None:
+        self.load_ecg_block(buffer.snapshot())
+
+    def load_ecg_block(self, block) -> None:
+        # recordings arrive already decoded to float64; live float32 buffers are widened as they are
+        values = block.channel(0).astype(np.float64, copy=False)
+        self.ecg = ECGTrace(block.sample_num, values, block.timestamp_ns).sorted_by_time()
 
     def find_nearest_sample_index(self, target_ns: int) -> Optional[int]:
-        if not self.ecg_samples:
+        timestamps = self.ecg.timestamp_ns
+        if not len(timestamps):
             return None
 
-        timestamps = [s.timestamp_ns for s in self.ecg_samples]
         idx = int(np.searchsorted(timestamps, target_ns))
         if idx <= 0:
             return 0
@@ -152,10 +403,10 @@ class EKGSync:
             return before
         return idx
 
-    def trim_ecg_to_holo(self) -> Tuple[List[ECGSample], Dict[str, Any]]:
+    def trim_ecg_to_holo(self) -> Tuple[ECGTrace, Dict[str, Any]]:
         if self.holo_unix_first is None or self.holo_unix_last is None:
             raise RuntimeError('HDF5 holo timestamps not loaded')
-        if not self.ecg_samples:
+        if not len(self.ecg):
             raise RuntimeError('ECG samples not loaded')
 
         holo_first_ns = int(self.holo_unix_first * 1_000)
@@ -170,33 +421,50 @@ class EKGSync:
         if start_idx > end_idx:
             start_idx, end_idx = end_idx, start_idx
 
-        trimmed = self.ecg_samples[start_idx:end_idx + 1]
+        trimmed = self.ecg[start_idx:end_idx + 1]
+        first = trimmed[0] if len(trimmed) else None
+        last = trimmed[-1] if len(trimmed) else None
 
         info: Dict[str, Any] = {
             'start_idx': start_idx,
             'end_idx': end_idx,
-            'start_sample': trimmed[0] if trimmed else None,
-            'end_sample': trimmed[-1] if trimmed else None,
+            'start_sample': first,
+            'end_sample': last,
             'holo_first_ns': holo_first_ns,
             'holo_last_ns': holo_last_ns,
-            'start_time_diff_ns': abs(trimmed[0].timestamp_ns - holo_first_ns) if trimmed else None,
-            'end_time_diff_ns': abs(trimmed[-1].timestamp_ns - holo_last_ns) if trimmed else None,
+            'start_time_diff_ns': abs(first.timestamp_ns - holo_first_ns) if first else None,
+            'end_time_diff_ns': abs(last.timestamp_ns - holo_last_ns) if last else None,
         }
 
         return trimmed, info
 
-    def save_trimmed_csv(self, samples: List[ECGSample], path: str) -> None:
+    def save_trimmed_csv(self, samples, path: str, chunk_rows: int = 65536) -> None:
+        trace = samples if isinstance(samples, ECGTrace) else ECGTrace.from_samples(samples)
         fieldnames = ['sample_num', 'analog_value', 'timestamp_ns', 'timestamp_seconds']
+        columns = [trace.sample_num, trace.analog_value, trace.timestamp_ns, trace.timestamp_seconds]
         with open(path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for s in samples:
-                writer.writerow({'sample_num': s.sample_num, 'analog_value': s.analog_value, 'timestamp_ns': s.timestamp_ns, 'timestamp_seconds': s.timestamp_seconds})
-
-    def save_trimmed_json(self, samples: List[ECGSample], path: str) -> None:
-        out = [s.__dict__ for s in samples]
-        with open(path, 'w') as f:
-            json.dump(out, f, indent=2)
+            f.write(','.join(fieldnames) + '\r\n')
+            # numpy's str() of float64 is the shortest repr, the same text csv.DictWriter wrote
+            for start in range(0, len(trace), chunk_rows):
+                text = [c[start:start + chunk_rows].astype(str).tolist() for c in columns]
+                f.write(''.join(','.join(row) + '\r\n' for row in zip(*text)))
+
+    def save_trimmed_json(self, samples, path: str, legacy: bool = False) -> None:
+        """Write the samples as columnar JSON: a meta block and one array per field.
+
+        ``legacy`` writes the old indented list of per-sample objects.
+        """
+        trace = samples if isinstance(samples, ECGTrace) else ECGTrace.from_samples(samples)
+        if legacy:
+            with open(path, 'w') as f:
+                json.dump([s.__dict__ for s in trace], f, indent=2)
+            return
+        meta = {
+            'count': len(trace),
+            'fields': list(ECGTrace.__slots__),
+            'units': {'analog_value': 'a.u.', 'timestamp_ns': 'ns', 'timestamp_seconds': 's'},
+        }
+        write_json_columns(path, meta, {name: getattr(trace, name) for name in ECGTrace.__slots__})
 
     def save_trim_info_json(self, info, path: str) -> None:
         def make_json_safe(obj):
@@ -215,52 +483,57 @@ class EKGSync:
         with open(path, "w") as f:
             json.dump(safe_info, f, indent=2)
 
-    def save_arterial_json(self, path: str) -> None:
-        import json, os
-        import numpy as np
-
-        if self.arterial_velocity is None or len(self.arterial_velocity) == 0:
-            raise ValueError("No arterial velocity data loaded.")
-
-        n = int(len(self.arterial_velocity))
-        vel = [float(v) for v in self.arterial_velocity]
-
-        unix_time_s = None
-        t_rel_s = None
+    def arterial_time_base(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Relative and Unix times (s) of the velocity samples, spread evenly over the holo recording.
 
+        Without usable holo timestamps the relative times are sample indices
+        and the Unix times are None.
+        """
+        n = len(self.arterial_velocity) if self.arterial_velocity is not None else 0
         if (
-            getattr(self, "holo_unix_first", None) is not None
-            and getattr(self, "holo_unix_last", None) is not None
+            self.holo_unix_first is not None
+            and self.holo_unix_last is not None
             and self.holo_unix_last > self.holo_unix_first
         ):
             duration_s = float(self.holo_unix_last - self.holo_unix_first) / 1_000_000.0
             t_rel = np.linspace(0.0, duration_s, n, dtype=float)
-            t_rel_s = t_rel.tolist()
-            unix_start_s = float(self.holo_unix_first) / 1_000_000.0
-            unix_time_s = (unix_start_s + t_rel).tolist()
-        else:
-            # No reliable timestamps; provide sample index as a fallback
-            t_rel_s = list(range(n))
-            unix_time_s = None
+            return t_rel, float(self.holo_unix_first) / 1_000_000.0 + t_rel
+        return np.arange(n), None
 
-        payload = {
-            "meta": {
-                "count": n,
-                "units": {"velocity": "a.u.", "time": "s"},
-                "has_absolute_unix_time": unix_time_s is not None,
-            },
-            "t_rel_s": t_rel_s,
-            "unix_time_s": unix_time_s,    # may be None if unavailable
-            "velocity": vel,
+    def save_arterial_json(self, path: str, legacy: bool = False) -> None:
+        """Write the velocity and its time base as columnar JSON.
+
+        The keys are the same in both layouts; ``legacy`` writes the old
+        indented file instead of the compact, chunk-streamed one.
+        """
+        velocity = self.arterial_velocity
+        if velocity is None or len(velocity) == 0:
+            raise ValueError("No arterial velocity data loaded.")
+
+        velocity = np.asarray(velocity, dtype=np.float64)
+        t_rel_s, unix_time_s = self.arterial_time_base()
+        meta = {
+            "count": int(len(velocity)),
+            "units": {"velocity": "a.u.", "time": "s"},
+            "has_absolute_unix_time": unix_time_s is not None,
         }
 
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if not legacy:
+            write_json_columns(path, meta, {"t_rel_s": t_rel_s, "unix_time_s": unix_time_s, "velocity": velocity})
+            return
+        payload = {
+            "meta": meta,
+            "t_rel_s": t_rel_s.tolist(),
+            "unix_time_s": unix_time_s.tolist() if unix_time_s is not None else None,
+            "velocity": velocity.tolist(),
+        }
         with open(path, "w") as f:
             json.dump(payload, f, indent=2)
 
     def plot_combined(
         self,
-        trimmed_samples: List[ECGSample],
+        trimmed_samples,
         show: bool = True,
         save_dir: Optional[str] = None,
     ) -> Optional[str]:
@@ -286,15 +559,13 @@ class EKGSync:
         ax1.grid(True, alpha=0.3)
 
 
-        ecg_t = []
-        ecg_v = []
-        if trimmed_samples:
-            ecg_t0 = trimmed_samples[0].timestamp_seconds
-            ecg_t = [s.timestamp_seconds - ecg_t0 for s in trimmed_samples]
-            ecg_v = [s.analog_value for s in trimmed_samples]
+        trace = trimmed_samples if isinstance(trimmed_samples, ECGTrace) else ECGTrace.from_samples(trimmed_samples)
+        has_ecg = len(trace) > 0
+        ecg_t = trace.timestamp_seconds - trace.timestamp_seconds[0] if has_ecg else None
+        ecg_v = trace.analog_value
 
         ax2 = plt.subplot(3, 1, 2)
-        if ecg_t:
+        if has_ecg:
             ax2.plot(ecg_t, ecg_v, '-', color='green')
             ax2.set_ylabel('ECG')
             ax2.set_title('Trimmed ECG')
@@ -313,7 +584,7 @@ class EKGSync:
         ax3.set_xlabel('Time (s)')
         ax3.grid(True, alpha=0.3)
 
-        if ecg_t:
+        if has_ecg:
             ax3r = ax3.twinx()
             ax3r.plot(ecg_t, ecg_v, '-', label='ECG', alpha=0.9, color='green')
             ax3r.set_ylabel('ECG')
@@ -347,13 +618,13 @@ def _demo_cli():
 
     p = argparse.ArgumentParser(description='Simple EKG/Holo sync demo')
     p.add_argument('--h5', required=True, help='Path to holo HDF5 file')
-    p.add_argument('--ecg', required=True, help='Path to ECG CSV file')
+    p.add_argument('--ecg', required=True, help='Path to ECG recording (.csv or .h5)')
     p.add_argument('--out', help='Path to write trimmed CSV')
     args = p.parse_args()
 
     s = EKGSync()
     s.load_h5(args.h5)
-    s.load_ecg_csv(args.ecg)
+    s.load_ecg(args.ecg)
     trimmed, info = s.trim_ecg_to_holo()
     print('Trim info:', info)
     if args.out:
@@ -4,15 +4,23 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-from .sync import EKGSync
 
 
 class SyncGUI(tk.Tk):
+    @property
+    def sync(self):
+        # numpy and the sync module load on first use rather than before the window shows
+        if self._sync is None:
+            from .cache import ParsedECGCache
+            from .sync import EKGSync
+            self._sync = EKGSync(ecg_cache=ParsedECGCache())
+        return self._sync
+
     def __init__(self) -> None:
         super().__init__()
         self.title('EKG <-> Holo Sync')
-        self.geometry('600x260')
-        self.sync = EKGSync()
+        self.geometry('600x480')
+        self._sync = None
         self.configure(bg="#2e2e2e")
 
         self.ecg_path_var = tk.StringVar(value='')
@@ -21,6 +29,8 @@ class SyncGUI(tk.Tk):
         self.out_dir_var = tk.StringVar(value='')
 
         self.use_manual_cut_var = tk.BooleanVar(value=False)
+        self.force_var = tk.BooleanVar(value=False)
+        self.bundle_var = tk.BooleanVar(value=False)
         self.manual_start_var = tk.StringVar(value='')
         self.manual_end_var = tk.StringVar(value='')
 
@@ -44,15 +54,36 @@ class SyncGUI(tk.Tk):
 
         tk.Checkbutton(self, text='Use manual start/end cut', variable=self.use_manual_cut_var, bg="#2e2e2e", fg="white", activebackground="#2e2e2e", activeforeground="white",selectcolor="#2e2e2e").grid(row=3, column=0, columnspan=3, sticky='w', padx=8)
 
-        tk.Button(self, text='Process, Trim, and Plot', command=self.process_batch, bg="#5d5d5d").grid(row=3, column=1, pady=12)
+        tk.Checkbutton(self, text='Redo unchanged runs', variable=self.force_var, bg="#2e2e2e", fg="white", activebackground="#2e2e2e", activeforeground="white", selectcolor="#2e2e2e").grid(row=7, column=0, columnspan=3, sticky='w', padx=8)
+
+        tk.Checkbutton(self, text='Also write one HDF5 bundle per run (+ study.h5)', variable=self.bundle_var, bg="#2e2e2e", fg="white", activebackground="#2e2e2e", activeforeground="white", selectcolor="#2e2e2e").grid(row=8, column=0, columnspan=3, sticky='w', padx=8)
+
+        self.process_btn = tk.Button(self, text='Process, Trim, and Plot', command=self.process_batch, bg="#5d5d5d")
+        self.process_btn.grid(row=3, column=1, pady=12)
+        self.cancel_btn = tk.Button(self, text='Cancel', command=self.cancel_batch, bg="#5d5d5d", state=tk.DISABLED)
+        self.cancel_btn.grid(row=3, column=2, pady=12)
+        self.batch = None
 
         self.status_var = tk.StringVar(value='')
         tk.Label(self, textvariable=self.status_var, bg="#2e2e2e").grid(row=4, column=0, columnspan=3, sticky='w', padx=8)
 
+        # one line per holo file of the current batch, refreshed while it runs
+        files_frame = tk.Frame(self, bg="#2e2e2e")
+        files_frame.grid(row=9, column=0, columnspan=3, sticky='nsew', padx=8, pady=(4, 8))
+        self.files_list = tk.Listbox(files_frame, height=8, bg="#3a3a3a", fg="white", activestyle='none')
+        files_scroll = tk.Scrollbar(files_frame, orient=tk.VERTICAL, command=self.files_list.yview)
+        self.files_list.config(yscrollcommand=files_scroll.set)
+        self.files_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        files_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
         self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(9, weight=1)
 
     def browse_ecg(self) -> None:
-        path = filedialog.askopenfilename(title='Select ECG CSV', filetypes=[('CSV files', '*.csv'), ('All files', '*.*')])
+        path = filedialog.askopenfilename(
+            title='Select ECG recording',
+            filetypes=[('ECG recordings', '*.csv;*.h5;*.hdf5'), ('CSV files', '*.csv'), ('HDF5 recordings', '*.h5;*.hdf5'), ('All files', '*.*')],
+        )
         if path:
             self.ecg_path_var.set(path)
             self.status_var.set(f'Loaded ECG path: {os.path.basename(path)}')
@@ -108,76 +139,95 @@ class SyncGUI(tk.Tk):
                 messagebox.showerror('Manual Cut', f'Invalid time format: {ex}')
                 return
 
-        try:
-            self.status_var.set('Loading ECG CSV...')
-            self.update_idletasks()
-            self.sync.load_ecg_csv(ecg_path)
-
-            ecg_stem = os.path.splitext(os.path.basename(ecg_path))[0]
-            os.makedirs(out_dir, exist_ok=True)
-            saved_lines = []
-
-            for i, h5_path in enumerate(self.h5_paths, 1):
-                if not os.path.exists(h5_path):
-                    continue
-
-                h5_stem = os.path.splitext(os.path.basename(h5_path))[0]
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Loading H5: {os.path.basename(h5_path)}')
-                self.update_idletasks()
-                self.sync.load_h5(h5_path)
-
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Trimming...')
-                self.update_idletasks()
-
-                if use_manual:
-                    trimmed, info = self.sync.trim_ecg_by_seconds(
-                        manual_start_s, manual_end_s, relative_to_ecg_start=False
-                    )
-                else:
-                    trimmed, info = self.sync.trim_ecg_to_holo()
-
-                run_dir = os.path.join(out_dir, f'trimmed_{ecg_stem}__{h5_stem}')
-                os.makedirs(run_dir, exist_ok=True)
-
-                csv_path = os.path.join(run_dir, 'trimmed_ekg.csv')
-                info_json_path = os.path.join(run_dir, 'trim_info.json')
-                arterial_json_path = os.path.join(run_dir, 'arterial_flow.json')
-
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Saving trimmed CSV...')
-                self.update_idletasks()
-                self.sync.save_trimmed_csv(trimmed, csv_path)
-
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Saving trim info JSON...')
-                self.update_idletasks()
-                self.sync.save_trim_info_json(info, info_json_path)
-
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Saving arterial flow JSON...')
-                self.update_idletasks()
-                try:
-                    self.sync.save_arterial_json(arterial_json_path)
-                except Exception:
-                    pass
-
-                self.status_var.set(f'[{i}/{len(self.h5_paths)}] Rendering and saving plots...')
-                self.update_idletasks()
-                png_path = self.sync.plot_combined(trimmed, show=False, save_dir=run_dir)
-
-                line = (
-                    f"- {os.path.basename(h5_path)}\n"
-                    f"    Folder: {run_dir}\n"
-                    f"    CSV: {csv_path}\n"
-                    f"    Trim Info: {info_json_path}\n"
-                    f"    Arterial Flow: {arterial_json_path}"
-                )
-                if png_path:
-                    line += f"\n    Plot: {png_path}"
-                saved_lines.append(line)
-
-            self.status_var.set('Done')
-            messagebox.showinfo('Success', "Saved outputs for:\n\n" + "\n\n".join(saved_lines))
-        except Exception as e:
-            messagebox.showerror('Error', f'Processing failed: {e}')
-            self.status_var.set(f'Error: {e}')
+        from .batch import BatchRun
+
+        manual = (manual_start_s, manual_end_s) if use_manual else None
+        self.batch = BatchRun(
+            ecg_path, self.h5_paths, out_dir, manual=manual, sync=self.sync, force=self.force_var.get(),
+            formats=('csv', 'h5') if self.bundle_var.get() else ('csv',),
+        ).start()
+        self.process_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.files_list.delete(0, tk.END)
+        for h5_path in self.batch.h5_paths:
+            self.files_list.insert(tk.END, self._file_line(self.batch, h5_path))
+        self._watch_batch()
+
+    def cancel_batch(self) -> None:
+        if self.batch is not None and not self.batch.done:
+            self.batch.cancel()
+            self.status_var.set('Cancelling: files already running will finish...')
+
+    @staticmethod
+    def _file_line(batch, h5_path: str) -> str:
+        state = batch.states.get(h5_path, 'queued')
+        result = batch.results.get(h5_path) or {}
+        line = f"{os.path.basename(h5_path)}: {state}"
+        if result.get('error'):
+            line += f" - {result['error']}"
+        elif result.get('skipped'):
+            line += f" ({result['skipped']})"
+        elif state == 'done' and result.get('seconds') is not None:
+            line += f" ({result['seconds']:.1f} s)"
+        return line
+
+    def _refresh_file_list(self, batch) -> None:
+        for i, h5_path in enumerate(batch.h5_paths):
+            line = self._file_line(batch, h5_path)
+            if self.files_list.get(i) != line:
+                self.files_list.delete(i)
+                self.files_list.insert(i, line)
+                if batch.states.get(h5_path) == 'failed':
+                    self.files_list.itemconfig(i, fg="#ff8080")
+
+    def _watch_batch(self) -> None:
+        batch = self.batch
+        self._refresh_file_list(batch)
+        if not batch.done:
+            self.status_var.set(batch.status())
+            self.after(200, self._watch_batch)
+            return
+
+        self.process_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        if batch.error is not None:
+            messagebox.showerror('Error', f'Processing failed: {batch.error}')
+            self.status_var.set(f'Error: {batch.error}')
+            return
+
+        saved_lines = []
+        for h5_path in batch.h5_paths:
+            result = batch.results.get(h5_path)
+            if result is None or result.get('error') or result.get('skipped'):
+                continue
+            line = (
+                f"- {os.path.basename(h5_path)}{' (unchanged)' if result.get('cached') else ''}\n"
+                f"    Folder: {result['run_dir']}\n"
+                f"    CSV: {result['csv']}\n"
+                f"    Trim Info: {result['trim_info']}\n"
+                f"    Arterial Flow: {result['arterial']}"
+            )
+            if result.get('bundle'):
+                line += f"\n    HDF5 bundle: {result['bundle']}"
+            if result['plot']:
+                line += f"\n    Plot: {result['plot']}"
+            saved_lines.append(line)
+        if batch.study_path:
+            saved_lines.append(f"Study file: {batch.study_path}")
+        if batch.index is not None:
+            stats = batch.index.stats()
+            saved_lines.append(
+                f"Run index: {stats['hits']} reused, {stats['misses']} recomputed ({stats['runs']} runs in {stats['index']})"
+            )
+        failed_lines = [f"- {os.path.basename(r['h5_path'])}: {r['error']}" for r in batch.failures()]
+
+        self.status_var.set(('Cancelled: ' if batch.cancelled else 'Done: ') + batch.status())
+        message = "Saved outputs for:\n\n" + "\n\n".join(saved_lines) if saved_lines else "No files were processed."
+        if failed_lines:
+            message += "\n\nFailed:\n" + "\n".join(failed_lines)
+            messagebox.showwarning('Finished with errors', message)
+        else:
+            messagebox.showinfo('Success', message)
 
 
 
@@ -0,0 +1,226 @@
+"""Headless batch sync for whole studies: ``mountsinai-ekg-sync-batch``.
+
+Every ECG recording is trimmed against every holo file it overlaps, on a
+process pool, and a manifest of all runs is written at the end. Nothing on
+this path imports Tk, and plots render with the Agg backend.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+ECG_EXTENSIONS = ('.csv', '.h5', '.hdf5')
+HOLO_EXTENSIONS = ('.h5', '.hdf5')
+
+# flattened columns of the CSV manifest, in order
+MANIFEST_FIELDS = [
+    'ecg_path', 'h5_path', 'status', 'error', 'reason', 'seconds', 'rows', 'run_dir',
+    'csv', 'json', 'bundle', 'trim_info', 'arterial', 'plot',
+    'trim_mode', 'start_idx', 'end_idx', 'start_ns', 'end_ns', 'start_time_diff_ns', 'end_time_diff_ns',
+]
+
+
+def expand_inputs(patterns, extensions):
+    """Files named by ``patterns``: paths, directories (searched recursively) or globs."""
+    found = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True) or [pattern]
+        for path in sorted(matches):
+            if os.path.isdir(path) or os.path.splitext(path)[1].lower() not in extensions:
+                continue
+            path = os.path.abspath(path)
+            if path not in found:
+                found.append(path)
+    return found
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description='Trim ECG recordings against holo HDF5 files without the GUI.')
+    p.add_argument('--ecg', nargs='+', required=True,
+                   help='ECG recordings (.csv/.h5): files, directories or globs')
+    p.add_argument('--h5', nargs='+', required=True,
+                   help='Holo HDF5 files: files, directories or globs')
+    p.add_argument('-o', '--out', required=True, help='Output folder; one run folder per ECG/holo pair')
+    p.add_argument('--workers', type=int, default=0, help='Worker processes (default: CPU count - 1)')
+    p.add_argument('--formats', default='csv',
+                   help='Trimmed ECG formats, comma separated: csv, json, h5 (default csv). '
+                        'h5 writes one self-contained HDF5 bundle per run and a study.h5 linking them')
+    p.add_argument('--no-plot', action='store_true', help='Skip the combined plot PNGs')
+    p.add_argument('--legacy-json', action='store_true',
+                   help='Write JSON outputs in the old indented layout (a list of sample objects for the trimmed ECG)')
+    p.add_argument('--all-pairs', action='store_true',
+                   help='Also process holo files recorded outside an ECG recording (default: skip them)')
+    p.add_argument('--manual-start', help='Manual cut start, as in the sync window (Unix time in microseconds)')
+    p.add_argument('--manual-end', help='Manual cut end, as in the sync window (Unix time in microseconds)')
+    p.add_argument('--manifest', help='Manifest path; .csv writes CSV, anything else JSON (default <out>/manifest.json)')
+    p.add_argument('--no-cache', action='store_true', help='Do not use the parsed-ECG cache')
+    p.add_argument('--force', action='store_true',
+                   help='Redo every run, even those unchanged since the last batch into this output folder')
+    return p
+
+
+def _manifest_row(entry):
+    row = {k: entry.get(k) for k in MANIFEST_FIELDS}
+    trim = entry.get('trim') or {}
+    row['trim_mode'] = trim.get('mode')
+    for key in ('start_idx', 'end_idx', 'start_ns', 'end_ns', 'start_time_diff_ns', 'end_time_diff_ns'):
+        row[key] = trim.get(key)
+    return row
+
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.part'
+    if path.lower().endswith('.csv'):
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            for entry in manifest['runs']:
+                writer.writerow(_manifest_row(entry))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def run_batch(args) -> int:
+    from .batch import TRIMMED_FORMATS, BatchRun, unique_stems
+    from .cache import ParsedECGCache
+    from .holo import HoloSourcePool
+    from .sync import EKGSync
+
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    unknown = sorted(set(formats) - set(TRIMMED_FORMATS))
+    if unknown:
+        print(f"Unknown format(s): {', '.join(unknown)} (choose from {', '.join(TRIMMED_FORMATS)})")
+        return 2
+    manual = None
+    if args.manual_start or args.manual_end:
+        if not (args.manual_start and args.manual_end):
+            print('Provide both --manual-start and --manual-end')
+            return 2
+        manual = (EKGSync._parse_time_to_seconds(args.manual_start), EKGSync._parse_time_to_seconds(args.manual_end))
+
+    ecg_paths = expand_inputs(args.ecg, ECG_EXTENSIONS)
+    h5_paths = expand_inputs(args.h5, HOLO_EXTENSIONS)
+    # an ECG recording saved as .h5 can match both patterns; it is never a holo file
+    h5_paths = [p for p in h5_paths if p not in ecg_paths]
+    if not ecg_paths or not h5_paths:
+        print(f'Nothing to do: {len(ecg_paths)} ECG recording(s), {len(h5_paths)} holo file(s)')
+        return 2
+
+    out_dir = os.path.abspath(os.path.expanduser(args.out))
+    manifest_path = args.manifest or os.path.join(out_dir, 'manifest.json')
+    cache = None if args.no_cache else ParsedECGCache()
+    # recordings sharing a name (e.g. from different folders) must not share run folders
+    ecg_stems = unique_stems(ecg_paths)
+    print(f'{len(ecg_paths)} ECG recording(s) x {len(h5_paths)} holo file(s) -> {out_dir}')
+
+    started = time.time()
+    runs = []
+    failed = False
+    current = None
+    study_path = None
+    index_hits = index_misses = 0
+    # holo timestamps are checked against every ECG recording; keep the files open between them
+    holo_pool = HoloSourcePool(max_open=min(len(h5_paths), 64))
+    try:
+        for i, ecg_path in enumerate(ecg_paths, 1):
+            current = BatchRun(
+                ecg_path,
+                h5_paths,
+                out_dir,
+                manual=manual,
+                plot=not args.no_plot,
+                workers=args.workers or None,
+                sync=EKGSync(ecg_cache=cache),
+                formats=formats,
+                skip_disjoint=not args.all_pairs,
+                force=args.force,
+                legacy_json=args.legacy_json,
+                ecg_stem=ecg_stems[ecg_path],
+                holo_pool=holo_pool,
+            ).start()
+            last_status = None
+            while not current.wait(timeout=1.0):
+                status = current.status()
+                if status != last_status:
+                    print(f'[{i}/{len(ecg_paths)}] {os.path.basename(ecg_path)}: {status}', flush=True)
+                    last_status = status
+            print(f'[{i}/{len(ecg_paths)}] {os.path.basename(ecg_path)}: {current.status()}', flush=True)
+            study_path = current.study_path or study_path
+            if current.index is not None:
+                index_hits += current.index.hits
+                index_misses += current.index.misses
+
+            if current.error is not None:
+                failed = True
+                print(f'  failed to load: {current.error}')
+                runs.append({'ecg_path': ecg_path, 'h5_path': None, 'status': 'failed', 'error': str(current.error)})
+                continue
+            for h5_path in h5_paths:
+                entry = {'ecg_path': ecg_path, 'status': current.states[h5_path]}
+                entry.update(current.results.get(h5_path, {'h5_path': h5_path, 'error': None}))
+                entry.pop('traceback', None)
+                entry.pop('cached', None)
+                if 'skipped' in entry:
+                    entry['reason'] = entry.pop('skipped')
+                if entry.get('error'):
+                    failed = True
+                    print(f"  {os.path.basename(h5_path)}: {entry['error']}")
+                runs.append(entry)
+    except KeyboardInterrupt:
+        print('Interrupted; waiting for running files to finish...')
+        if current is not None:
+            current.cancel()
+            current.wait()
+        failed = True
+    finally:
+        holo_pool.close()
+
+    manifest = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'elapsed_s': round(time.time() - started, 3),
+        'out_dir': out_dir,
+        'options': {
+            'formats': formats,
+            'legacy_json': args.legacy_json,
+            'plot': not args.no_plot,
+            'manual': manual,
+            'all_pairs': args.all_pairs,
+            'workers': args.workers or None,
+        },
+        'ecg_paths': ecg_paths,
+        'h5_paths': h5_paths,
+        'study': study_path,
+        'run_index': {'unchanged': index_hits, 'recomputed': index_misses, 'force': args.force},
+        'runs': runs,
+    }
+    write_manifest(manifest_path, manifest)
+    done = sum(1 for r in runs if r['status'] == 'done')
+    unchanged = sum(1 for r in runs if r['status'] == 'unchanged')
+    skipped = sum(1 for r in runs if r['status'] == 'skipped')
+    print(
+        f'{done} run(s) written, {unchanged} unchanged, {skipped} skipped, '
+        f'{len(runs) - done - unchanged - skipped} not; '
+        f'manifest: {manifest_path}'
+    )
+    if study_path:
+        print(f'Study file: {study_path}')
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(run_batch(args))
+
+
+if __name__ == '__main__':
+    main()
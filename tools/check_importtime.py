@@ -0,0 +1,81 @@
+"""Track cold-import cost of the package entry points.
+
+Each entry module is imported in a fresh interpreter with ``-X importtime``.
+The check fails if a module pulls in a heavy dependency it should load
+lazily, or if its cumulative import time exceeds its budget. Budgets are
+loose on purpose; the dependency check is what catches regressions on any
+machine.
+
+    python tools/check_importtime.py            # check and print a table
+    python tools/check_importtime.py --json out.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# module -> (budget in ms, top-level packages that must not be imported)
+ENTRY_POINTS = {
+    "mountsinai_ekg.gui": (400, ["matplotlib", "scipy", "h5py"]),
+    "mountsinai_ekg.syncGUI": (150, ["numpy", "h5py", "matplotlib"]),
+    "mountsinai_ekg.sync": (400, ["h5py", "matplotlib", "scipy"]),
+    "mountsinai_ekg.capture": (500, ["tkinter", "matplotlib", "scipy"]),
+    "mountsinai_ekg.syncbatch": (150, ["numpy", "tkinter", "matplotlib", "h5py"]),
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module, repeat=3):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    best = None
+    imported = set()
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+        total_us = None
+        for line in proc.stderr.splitlines():
+            m = _LINE.match(line)
+            if not m:
+                continue
+            imported.add(m.group(4).split(".")[0])
+            if m.group(4) == module:
+                total_us = int(m.group(2))
+        if total_us is not None and (best is None or total_us < best):
+            best = total_us
+    return (best or 0) / 1000.0, imported
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Check import time of the package entry points.")
+    p.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest counts (default 3)")
+    p.add_argument("--json", help="Write the measurements to this file")
+    args = p.parse_args(argv)
+
+    results = {}
+    failed = False
+    for module, (budget_ms, forbidden) in ENTRY_POINTS.items():
+        ms, imported = measure(module, args.repeat)
+        heavy = sorted(set(forbidden) & imported)
+        ok = ms <= budget_ms and not heavy
+        failed |= not ok
+        results[module] = {"ms": round(ms, 1), "budget_ms": budget_ms, "unexpected_imports": heavy, "ok": ok}
+        note = f"  imports {', '.join(heavy)}" if heavy else ""
+        print(f"{'ok  ' if ok else 'FAIL'} {module:<26} {ms:7.1f} ms (budget {budget_ms} ms){note}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())